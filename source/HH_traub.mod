@@ -12,6 +12,10 @@ TITLE Hippocampal HH channels
 :
 : Modified Oct 96 for compatibility with Windows: trap low values of arguments
 :
+: Declared THREADSAFE, so that cells with it can be simulated in several
+: threads (ParallelContext.nthread): all its variables are RANGE, and the
+: VERBATIM block only returns.
+:
 
 INDEPENDENT {t FROM 0 TO 1 WITH 1 (ms)}
 
@@ -23,6 +27,7 @@ NEURON {
 	RANGE m_inf, h_inf, n_inf
 	RANGE tau_m, tau_h, tau_n
 	RANGE m_exp, h_exp, n_exp
+	THREADSAFE
 }
 
 
@@ -0,0 +1,139 @@
+TITLE Hippocampal HH channels, tabulated rates
+:
+: Same currents and integration as HH_traub.mod (hh2), with the rate
+: functions read from tables instead of evaluated at every step.
+:
+: The tables are indexed by v - vtraub, the voltage in the Traub convention,
+: so each vtraub is a shift along them and changing vtraub needs no new table.
+: They depend on dt and celsius, and are recomputed when either changes.
+: usetable_hh2f = 0 switches them off, and the rates are computed exactly.
+:
+: Linear interpolation between points 0.01 mV apart: on the part 1
+: protocols the traces stay within about 0.05 mV of those of hh2, with the
+: spikes on the same steps, except HHx at 4.6 nA, just above its threshold,
+: where one spike moves by a step (python benchmark.py --mod-variants). With
+: 0.1 mV the error reaches 3.5 mV on spike upstrokes.
+:
+: THREADSAFE makes the assigned GLOBALs (the rates of the current
+: compartment) per thread, as in NEURON's hh.mod, so cells can be simulated
+: in several threads.
+:
+
+INDEPENDENT {t FROM 0 TO 1 WITH 1 (ms)}
+
+NEURON {
+	SUFFIX hh2f
+	USEION na READ ena WRITE ina
+	USEION k READ ek WRITE ik
+	RANGE gnabar, gkbar, vtraub
+	GLOBAL m_inf, h_inf, n_inf
+	GLOBAL tau_m, tau_h, tau_n
+	GLOBAL m_exp, h_exp, n_exp
+	THREADSAFE
+}
+
+
+UNITS {
+	(mA) = (milliamp)
+	(mV) = (millivolt)
+}
+
+PARAMETER {
+	gnabar  = .003  (mho/cm2)
+	gkbar   = .005  (mho/cm2)
+
+	ena     = 50    (mV)
+	ek      = -90   (mV)
+	celsius = 36    (degC)
+	dt              (ms)
+	v               (mV)
+	vtraub  = -63   (mV)
+}
+
+STATE {
+	m h n
+}
+
+ASSIGNED {
+	ina     (mA/cm2)
+	ik      (mA/cm2)
+	m_inf
+	h_inf
+	n_inf
+	tau_m
+	tau_h
+	tau_n
+	m_exp
+	h_exp
+	n_exp
+}
+
+
+BREAKPOINT {
+	SOLVE states
+	ina = gnabar * m*m*m*h * (v - ena)
+	ik  = gkbar * n*n*n*n * (v - ek)
+}
+
+
+PROCEDURE states() {    : exact when v held constant
+	evaluate_fct(v - vtraub)
+	m = m + m_exp * (m_inf - m)
+	h = h + h_exp * (h_inf - h)
+	n = n + n_exp * (n_inf - n)
+	VERBATIM
+	return 0;
+	ENDVERBATIM
+}
+
+UNITSOFF
+INITIAL {
+	m = 0
+	h = 0
+	n = 0
+}
+
+PROCEDURE evaluate_fct(v2(mV)) { LOCAL a,b,tadj
+
+	TABLE m_inf, h_inf, n_inf, tau_m, tau_h, tau_n, m_exp, h_exp, n_exp
+	DEPEND dt, celsius FROM -200 TO 200 WITH 40000
+
+:
+:  Q10 was assumed to be 3 for both currents
+:
+	tadj = 3.0 ^ ((celsius-36)/ 10 )
+
+	a = 0.32 * vtrap(13-v2, 4)
+	b = 0.28 * vtrap(v2-40, 5)
+	tau_m = 1 / (a + b) / tadj
+	m_inf = a / (a + b)
+
+	a = 0.128 * Exp((17-v2)/18)
+	b = 4 / ( 1 + Exp((40-v2)/5) )
+	tau_h = 1 / (a + b) / tadj
+	h_inf = a / (a + b)
+
+	a = 0.032 * vtrap(15-v2, 5)
+	b = 0.5 * Exp((10-v2)/40)
+	tau_n = 1 / (a + b) / tadj
+	n_inf = a / (a + b)
+
+	m_exp = 1 - Exp(-dt/tau_m)
+	h_exp = 1 - Exp(-dt/tau_h)
+	n_exp = 1 - Exp(-dt/tau_n)
+}
+FUNCTION vtrap(x,y) {
+	if (fabs(x/y) < 1e-6) {
+		vtrap = y*(1 - x/y/2)
+	}else{
+		vtrap = x/(Exp(x/y)-1)
+	}
+}
+
+FUNCTION Exp(x) {
+	if (x < -100) {
+		Exp = 0
+	}else{
+		Exp = exp(x)
+	}
+}
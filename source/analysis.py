@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   This file contains the analysis of voltage traces (spike detection and
+#   frequencies), shared by the parts of the toolset.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+from profiling import timed
+
+################################
+# Helper functions
+################################
+
+@timed('analysis')
+def spiketimes(data, v_th=0.5):
+    """Given voltage and time, returns array of spike times
+
+    Note: Code ripped off from one of the python exercise examples.
+
+    INPUT:
+
+    data - 2D array of [time, voltage] pairs
+    v_th - Threshold voltage to count a peak as a spike.
+
+    """
+
+    t, v = np.transpose(data)
+    v_above_th = v>v_th
+    idx = np.nonzero((v_above_th[:-1]==False)&(v_above_th[1:]==True))
+    return t[idx[0]+1]
+
+def spikefreq(data, v_th=0.5):
+    """Given voltage and time, returns spiking frequency
+
+    INPUT:
+
+    data - 2D array of [time, voltage] pairs
+
+    """
+    times = spiketimes(data, v_th=v_th)
+    if len(times) > 1:
+        freq = 1.0/np.mean(np.diff(times))
+    else:
+        freq = 0
+    return freq
+
+################################
+# Streaming reducers
+################################
+
+# Reducers compute a statistic of a trace while it is being simulated (see
+# the reducers argument of run_IClamp), so the trace itself is never kept.
+# start() is called at the beginning of every run, update(t, v) with each new
+# chunk of samples, and result() gives the value at the end.
+
+class Max(object):
+
+    """ Maximum of the trace """
+
+    def start(self):
+        self.value = -np.inf
+
+    def update(self, t, v):
+        if len(v):
+            self.value = max(self.value, v.max())
+
+    def result(self):
+        return self.value
+
+class Min(object):
+
+    """ Minimum of the trace """
+
+    def start(self):
+        self.value = np.inf
+
+    def update(self, t, v):
+        if len(v):
+            self.value = min(self.value, v.min())
+
+    def result(self):
+        return self.value
+
+class SpikeTimes(object):
+
+    """ Spike times, as spiketimes(data, v_th) """
+
+    def __init__(self, v_th=0.5):
+        self.v_th = v_th
+
+    def start(self):
+        self.times = []
+        self.above = None # was the last sample of the previous chunk above?
+
+    def update(self, t, v):
+        if not len(v):
+            return
+        above = v > self.v_th
+        idx = np.nonzero(~above[:-1] & above[1:])[0] + 1
+        if self.above is False and above[0]:
+            idx = np.concatenate(([0], idx))
+        self.times.extend(t[idx])
+        self.above = bool(above[-1])
+
+    def result(self):
+        return np.array(self.times)
+
+class SpikeCount(SpikeTimes):
+
+    """ Number of spikes. Only the count is kept. """
+
+    def start(self):
+        SpikeTimes.start(self)
+        self.count = 0
+
+    def update(self, t, v):
+        SpikeTimes.update(self, t, v)
+        self.count += len(self.times)
+        self.times = []
+
+    def result(self):
+        return self.count
+
+class ISIStats(SpikeTimes):
+
+    """ Interspike interval statistics: (mean ISI, coefficient of variation,
+    spiking frequency as spikefreq). The ISIs are accumulated, not kept.
+    Mean and CV are nan with fewer than two spikes. """
+
+    def start(self):
+        SpikeTimes.start(self)
+        self.last = None
+        self.n = 0
+        self.total = 0.
+        self.squares = 0.
+
+    def update(self, t, v):
+        SpikeTimes.update(self, t, v)
+        for spike in self.times:
+            if self.last is not None:
+                isi = spike - self.last
+                self.n += 1
+                self.total += isi
+                self.squares += isi**2
+            self.last = spike
+        self.times = []
+
+    def result(self):
+        if self.n == 0:
+            return np.nan, np.nan, 0
+        mean = self.total / self.n
+        std = np.sqrt(max(self.squares / self.n - mean**2, 0))
+        return mean, std / mean, 1.0 / mean
+
+class WindowMean(object):
+
+    """ Mean of the samples with t0 <= t < t1 """
+
+    def __init__(self, t0=0, t1=np.inf):
+        self.t0 = t0
+        self.t1 = t1
+
+    def start(self):
+        self.total = 0.
+        self.n = 0
+
+    def update(self, t, v):
+        inside = (t >= self.t0) & (t < self.t1)
+        self.total += v[inside].sum()
+        self.n += inside.sum()
+
+    def result(self):
+        return self.total / self.n if self.n else np.nan
+
+class EventWindows(object):
+
+    """ The samples from *pre* ms before to *post* ms after every upward
+    crossing of v_th (as spiketimes counts a spike), as a list of [time, v]
+    arrays, one per event. Between events only the last pre ms are kept, in
+    a ring buffer of fixed size, so memory depends on the number of events
+    and not on the length of the run. Windows of events closer than pre +
+    post overlap; a window still open at the end of the run is cut there.
+    Both edges are widened by half a time step, so samples whose times only
+    differ from the edges by round-off are kept, whatever the chunks.
+
+    dt - time step of the samples, to size the ring buffer and widen the
+        edges. Taken from the first chunk if not given.
+    """
+
+    def __init__(self, v_th=0, pre=2, post=5, dt=None):
+        self.v_th = v_th
+        self.pre = pre
+        self.post = post
+        self.dt = dt
+
+    def start(self):
+        self.windows = []
+        self.open = [] # [crossing time, chunks so far] of unfinished windows
+        self.ring = None
+        self.written = 0 # samples written to the ring so far
+        self.above = None
+
+    def _recent(self):
+        """ The samples in the ring buffer, oldest first """
+        size = len(self.ring)
+        n = min(self.written, size)
+        return self.ring[(self.written - n + np.arange(n)) % size]
+
+    def _store(self, chunk):
+        """ Writes chunk into the ring buffer, dropping the oldest samples """
+        size = len(self.ring)
+        chunk = chunk[-size:]
+        self.ring[(self.written + np.arange(len(chunk))) % size] = chunk
+        self.written += len(chunk)
+
+    def update(self, t, v):
+        if not len(v):
+            return
+        if self.ring is None:
+            dt = self.dt if self.dt is not None else \
+                    (t[1] - t[0] if len(t) > 1 else self.pre)
+            self.ring = np.empty((int(np.ceil(self.pre / dt)) + 2, 2))
+            self.tol = .5 * dt
+        pre, post = self.pre + self.tol, self.post + self.tol
+        chunk = np.column_stack((t, v))
+
+        # Samples after the crossings of the previous chunks
+        still_open = []
+        for t_cross, chunks in self.open:
+            chunks.append(chunk[t <= t_cross + post])
+            if t[-1] < t_cross + self.post - self.tol:
+                still_open.append([t_cross, chunks])
+            else:
+                self.windows.append(np.concatenate(chunks))
+        self.open = still_open
+
+        above = v > self.v_th
+        idx = np.nonzero(~above[:-1] & above[1:])[0] + 1
+        if self.above is False and above[0]:
+            idx = np.concatenate(([0], idx))
+        self.above = bool(above[-1])
+
+        # Windows of the new crossings: before from the ring and the chunk
+        for i in idx:
+            t_cross = t[i]
+            before = np.concatenate((self._recent(), chunk[:i]))
+            before = before[before[:, 0] >= t_cross - pre]
+            after = chunk[i:][t[i:] <= t_cross + post]
+            if t[-1] < t_cross + self.post - self.tol:
+                self.open.append([t_cross, [before, after]])
+            else:
+                self.windows.append(np.concatenate((before, after)))
+        self._store(chunk)
+
+    def result(self):
+        return self.windows + [np.concatenate(chunks)
+                for t_cross, chunks in self.open]
+
+################################
+# Batch analysis
+################################
+
+def _crossings(time, v, start, v_th, interpolate):
+    """ Upward crossings of v_th in the concatenated traces v, the traces
+    starting at the indices *start*, time(idx) giving the time of samples
+    idx. Returns (spike times, trace of each spike). """
+    above = v > v_th
+    up = ~above[:-1] & above[1:]
+    # no crossing from the end of a trace into the next one (empty traces
+    # have no end of their own: skip the starts before or after all samples)
+    boundary = start[1:]
+    up[boundary[(boundary > 0) & (boundary < len(v))] - 1] = False
+    idx = np.nonzero(up)[0]
+    if interpolate:
+        v0, v1 = v[idx], v[idx + 1]
+        t0, t1 = time(idx), time(idx + 1)
+        times = t0 + (v_th - v0) / (v1 - v0) * (t1 - t0)
+    else:
+        times = time(idx + 1)
+    return times, np.searchsorted(start, idx, side='right') - 1
+
+def _stats(time, v, lengths, v_th, interpolate):
+    """ spike_stats of one batch of concatenated traces """
+    K = len(lengths)
+    start = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    times, trace = _crossings(time, v, start, v_th, interpolate)
+
+    count = np.bincount(trace, minlength=K)
+    first = np.concatenate(([0], np.cumsum(count)[:-1]))
+    latency = np.full(K, np.nan)
+    latency[count > 0] = times[first[count > 0]]
+
+    # ISIs between consecutive spikes of the same trace
+    same = trace[1:] == trace[:-1]
+    isi, owner = np.diff(times)[same], trace[1:][same]
+    n = np.bincount(owner, minlength=K)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(owner, isi, minlength=K) / n
+        deviation = isi - mean[owner]
+        std = np.sqrt(np.bincount(owner, deviation**2, minlength=K) / n)
+        freq = np.where(n > 0, 1.0 / mean, 0.)
+        cv = std / mean
+
+    peak = np.full(K, np.nan)
+    nonempty = lengths > 0
+    if nonempty.any():
+        peak[nonempty] = np.maximum.reduceat(v, start[nonempty])
+    return {'times': np.split(times, first[1:]), 'count': count,
+            'latency': latency, 'isi_mean': mean, 'isi_cv': cv,
+            'freq': freq, 'peak': peak}
+
+def _batches(traces, t, samples):
+    """ Groups the traces into batches of about *samples* samples. Yields
+    (time, v, lengths) of the concatenated traces of each batch, time(idx)
+    giving the time of samples idx. """
+    if isinstance(traces, np.ndarray) and traces.ndim == 2:
+        # (K, n) voltages sharing the time points t
+        K, n = traces.shape
+        step = max(1, samples // max(n, 1))
+        time = lambda idx: t[idx % n]
+        for k in range(0, K, step):
+            v = np.ascontiguousarray(traces[k:k + step]).ravel()
+            yield time, v, np.full(len(v) // n, n)
+        return
+    batch = []
+    size = 0
+    for data in traces:
+        batch.append(np.asarray(data))
+        size += len(data)
+        if size >= samples:
+            yield _concatenate(batch)
+            batch, size = [], 0
+    if batch:
+        yield _concatenate(batch)
+
+def _concatenate(batch):
+    data = np.concatenate(batch)
+    t = data[:, 0]
+    return t.__getitem__, data[:, 1], np.array([len(d) for d in batch])
+
+def spike_stats(traces, t=None, v_th=0.5, interpolate=True, samples=10**6):
+    """
+    Spike statistics of many traces at once. Returns a dictionary of arrays
+    with one value per trace:
+
+    times - list of the arrays of spike times
+    count - number of spikes
+    latency - time of the first spike (nan if none)
+    isi_mean, isi_cv - mean and coefficient of variation of the
+        interspike intervals (nan with fewer than two spikes)
+    freq - spiking frequency, 1/isi_mean as spikefreq (0 with fewer than two
+        spikes)
+    peak - maximum voltage
+
+    INPUT
+
+    traces - (K, n) array of voltages, with their time points in t; or a
+        (K, n, 2) array or a sequence of [time, voltage] arrays of any length
+        (run_IClamp outputs, a TraceStore, a generator).
+    t - time points of a (K, n) array
+    v_th - threshold voltage to count a spike, crossed upwards as in
+        spiketimes
+    interpolate - place each crossing by linear interpolation between the
+        samples around it, instead of at the first sample above v_th. Spike
+        times are then accurate to much less than dt.
+    samples - traces are analysed in batches of about this many samples, so
+        a long sequence is not loaded at once.
+    """
+    if isinstance(traces, np.ndarray) and traces.ndim == 2 and t is None:
+        raise ValueError("spike_stats: t is needed with a 2D array")
+    results = [_stats(tb, vb, lengths, v_th, interpolate)
+            for tb, vb, lengths in _batches(traces, t, samples)]
+    if not results:
+        stats = dict((name, np.zeros(0)) for name in ('latency', 'isi_mean',
+            'isi_cv', 'freq', 'peak'))
+        stats.update({'times': [], 'count': np.zeros(0, int)})
+        return stats
+    stats = {'times': sum([r['times'] for r in results], [])}
+    for name in results[0]:
+        if name != 'times':
+            stats[name] = np.concatenate([r[name] for r in results])
+    return stats
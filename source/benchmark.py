@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Benchmarks of the simulation, sweep and analysis hot paths, on fixed
+#   workloads. Reports wall time, steps per second and peak memory of each
+#   (measured in a fresh process), saves them as JSON and compares them with
+#   a baseline saved earlier.
+#
+#   python benchmark.py                     run all (../data/benchmark.json)
+#   python benchmark.py --baseline FILE     also flag regressions against FILE
+#   python benchmark.py --backend hhbatch   time another run_IClamp
+#   python benchmark.py --backend cellbatch batched NEURON runs for sweeps
+#   python benchmark.py run_IClamp_600_0.01 only the named benchmarks
+#   python benchmark.py --mod-variants      original vs optimized mechanisms
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import importlib
+import multiprocessing
+
+import numpy as np
+
+import profiling
+import simulation
+import hhbatch
+import cellbatch
+from analysis import spiketimes, spikefreq
+
+################################
+# Backends
+################################
+
+# A backend is a function with the signature of run_IClamp. Others can be
+# added to this dictionary, or given as module:function on the command line.
+# CVode cannot integrate hh2: with the cvode backend, the part 1 workloads
+# give errors and only those of the hh soma and of the part 2 tree run.
+BACKENDS = {
+    'neuron': simulation.run_IClamp,
+    'cvode': lambda sec, **kwargs: simulation.run_IClamp(sec, cvode=True,
+        **kwargs),
+    'hhbatch': hhbatch.run_IClamp,
+    'cellbatch': cellbatch.run_IClamp,
+}
+
+# Backends that run a sequence of amplitudes at once
+BATCHED = (hhbatch.run_IClamp, cellbatch.run_IClamp)
+
+def get_backend(name):
+    """ Backend *name* from BACKENDS, or a 'module:function' """
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, function = name.split(':')
+    return getattr(importlib.import_module(module), function)
+
+################################
+# Workloads
+################################
+
+# Each benchmark is a function of the backend returning (run, steps): run
+# does the work once, steps is the number of time steps (or samples, for the
+# analysis benchmarks) it processes. Setup is not timed.
+BENCHMARKS = []
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS.append((name, function))
+        return function
+    return register
+
+def _part1_section(model='HH'):
+    """ The HH section of part 1 (or another model of the registry) """
+    from toolset import models
+    return models.get(model)
+
+def _hh_section():
+    """ A part 1 soma with the standard hh channels instead of hh2, at 6.3
+    degC, which every backend can run (CVode too) """
+    from toolset import h, DefaultSection
+    h.celsius = 6.3
+    return DefaultSection('HH_hh', 'hh')
+
+def _steps(tstop, dt):
+    return int(np.ceil(tstop / dt))
+
+def _single_run(tstop, dt, model='HH', amp=0.5):
+    def setup(run_IClamp):
+        sec = _hh_section() if model == 'hh' else _part1_section(model)
+        def run():
+            run_IClamp(sec, delay=50, dur=500, amp=amp, tstop=tstop, dt=dt)
+        return run, _steps(tstop, dt)
+    return setup
+
+for tstop, dt in ((100, 0.025), (600, 0.025), (600, 0.01)):
+    benchmark('run_IClamp_%g_%g' % (tstop, dt))(_single_run(tstop, dt))
+
+# HH with the tabulated hh2 rates (HH_traub_fast.mod)
+benchmark('run_IClamp_600_0.025_hh2f')(_single_run(600, 0.025, 'HH_fast'))
+
+# The hh soma, spiking regularly: the workload of the cvode backend
+benchmark('run_IClamp_600_0.025_hh')(_single_run(600, 0.025, 'hh', amp=2))
+
+@benchmark('prob1_2_fI')
+def fI_sweep(run_IClamp):
+    """ The f-I curve of HH in prob1_2, 40 currents """
+    sec = _part1_section()
+    I = np.arange(0, 1, 0.025)
+    def run():
+        if run_IClamp in BATCHED:
+            data = run_IClamp(sec, delay=0, dur=100, amp=I, tstop=100)
+        else:
+            data = [run_IClamp(sec, delay=0, dur=100, amp=amp, tstop=100)
+                    for amp in I]
+        [spikefreq(d, v_th=0) for d in data]
+    return run, len(I) * _steps(100, 0.025)
+
+@benchmark('prob2_2_b_reduced')
+def summation_grid(run_IClamp):
+    """ Every 6th point of the prob2_2_b grid (50 points), on the part2 tree
+    """
+    from toolset import models
+    soma, dend1, dend2, dend3 = models.get('tree')
+    points = [(i, j) for i in range(0, 60, 6) for j in range(0, 30, 6)]
+    def run():
+        for i, j in points:
+            dend2.reset_synapses()
+            dend3.reset_synapses()
+            dend2.activate_synapses(N=i, onset=0)
+            dend3.activate_synapses(N=j, onset=0)
+            run_IClamp(soma, delay=0, dur=0, amp=0, tstop=25, dt=0.01)
+        dend2.reset_synapses()
+        dend3.reset_synapses()
+    return run, len(points) * _steps(25, 0.01)
+
+def _long_trace():
+    """ 10 s of regular spiking at dt=0.025, 400000 samples """
+    sec = _part1_section()
+    return simulation.run_IClamp(sec, delay=0, dur=10000, amp=0.5,
+            tstop=10000)
+
+@benchmark('spiketimes_long')
+def spiketimes_long(run_IClamp):
+    data = _long_trace()
+    return lambda: spiketimes(data, v_th=0), len(data)
+
+@benchmark('spikefreq_long')
+def spikefreq_long(run_IClamp):
+    data = _long_trace()
+    return lambda: spikefreq(data, v_th=0), len(data)
+
+@benchmark('figsave')
+def figsave_trace(run_IClamp):
+    """ U_vs_t of a 600 ms trace, saved as PDF """
+    import matplotlib
+    matplotlib.use('Agg')
+    from toolset import U_vs_t, figsave, plt
+    data = simulation.run_IClamp(_part1_section(), delay=50, dur=500,
+            amp=0.5, tstop=600)
+    folder = tempfile.mkdtemp()
+    def run():
+        plt.clf()
+        U_vs_t(data)
+        figsave('benchmark.pdf', folder=folder)
+    return run, len(data)
+
+################################
+# Mechanism variants
+################################
+
+# The part 1 protocols, as (name, [run_IClamp keyword arguments], number of
+# synapses opened at 10 ms) for each model: Skander's examples, part of the
+# prob1_2 f-I curves and the prob1_3 synaptic runs.
+def _protocols(model):
+    example = {'HH': 0.5, 'HHx': 4.6, 'HHxx': 0.26}[model]
+    currents = np.arange(4, 5, 0.1) if model == 'HHx' else \
+            np.arange(0, 1, 0.1)
+    Ns = {'HH': [1, 2, 3, 4, 5, 10, 40], 'HHx': [1, 10, 20, 23, 24, 25, 30,
+        40], 'HHxx': [1, 2, 3, 4, 10, 40]}[model]
+    return [
+        ('example', [dict(delay=50, dur=500, amp=example, tstop=600)], 0),
+        ('f-I', [dict(delay=0, dur=100, amp=I, tstop=100) for I in currents],
+            0),
+        ('synapses', [dict(delay=0, dur=20, amp=0, tstop=50, dt=0.01)
+            for N in Ns], Ns),
+        ]
+
+def _run_protocol(sec, runs, Ns):
+    """ Traces of the runs of a protocol, and the time they took """
+    traces = []
+    start = time.perf_counter()
+    for k, kwargs in enumerate(runs):
+        sec.reset_synapses()
+        if Ns:
+            sec.activate_synapses(N=Ns[k], onset=10)
+        traces.append(simulation.run_IClamp(sec, **kwargs))
+    elapsed = time.perf_counter() - start
+    sec.reset_synapses()
+    return traces, elapsed
+
+def _mechanism_cost(mechanism, nseg=1000, tstop=100, dt=0.025, repeat=3):
+    """ Time per segment and step (us) of a section with *nseg* segments
+    and only *mechanism*, the cost of the mechanism itself plus the
+    per-segment work of fadvance """
+    from toolset import h
+    sec = h.Section(name='benchmark_' + mechanism)
+    sec.nseg = nseg
+    sec.insert(mechanism)
+    h.dt = dt
+    times = []
+    try:
+        for i in range(repeat):
+            h.finitialize(-70)
+            start = time.perf_counter()
+            h('while (t < %.17g) { fadvance() }' % tstop)
+            times.append(time.perf_counter() - start)
+    finally:
+        h.delete_section(sec=sec)
+    return 1e6 * min(times) / (nseg * _steps(tstop, dt))
+
+def mod_variants(repeat=3):
+    """
+    Runs the part 1 protocols with the original mechanisms (hh2, ix, ixx)
+    and their optimized variants (hh2f, ixf, ixxf) on HH, HHx and HHxx.
+    Returns one dictionary per (model, protocol): time per step of each
+    (best of *repeat*, us), the speedup, the largest voltage difference
+    (mV) and the largest shift of a spike time (ms, nan if the number of
+    spikes differs). The first rows ('1000 seg') are the cost of each
+    mechanism alone per segment and step, without the fixed cost of a step.
+    """
+    results = []
+    for original, fast in sorted(hhbatch.FAST_VARIANTS.items()):
+        cost = [_mechanism_cost(m, repeat=repeat) for m in (original, fast)]
+        results.append({'model': '1000 seg', 'protocol': original,
+            'original_us': cost[0], 'fast_us': cost[1],
+            'speedup': cost[0] / cost[1], 'max_dv': np.nan,
+            'max_spike_shift': np.nan})
+    for model in ('HH', 'HHx', 'HHxx'):
+        original = _part1_section(model)
+        fast = _part1_section(model + '_fast')
+        for name, runs, Ns in _protocols(model):
+            steps = sum(_steps(r['tstop'], r.get('dt', 0.025)) for r in runs)
+            best = {}
+            for label, sec in (('original', original), ('fast', fast)):
+                times = []
+                for i in range(repeat):
+                    traces, elapsed = _run_protocol(sec, runs, Ns)
+                    times.append(elapsed)
+                best[label] = (min(times), traces)
+            dv = max(np.abs(a[:, 1] - b[:, 1]).max()
+                    for a, b in zip(best['original'][1], best['fast'][1]))
+            shift = 0.
+            for a, b in zip(best['original'][1], best['fast'][1]):
+                sa, sb = spiketimes(a, v_th=0), spiketimes(b, v_th=0)
+                if len(sa) != len(sb):
+                    shift = np.nan
+                    break
+                if len(sa):
+                    shift = max(shift, np.abs(sa - sb).max())
+            results.append({'model': model, 'protocol': name,
+                'original_us': 1e6 * best['original'][0] / steps,
+                'fast_us': 1e6 * best['fast'][0] / steps,
+                'speedup': best['original'][0] / best['fast'][0],
+                'max_dv': dv, 'max_spike_shift': shift})
+    return results
+
+def mod_variants_summary(results):
+    """ Table of the results of mod_variants """
+    lines = ['%-8s %-9s %12s %12s %8s %10s %10s' % ('model', 'protocol',
+        'orig [us/st]', 'fast [us/st]', 'speedup', 'max dv', 'spike dt')]
+    for r in results:
+        lines.append('%-8s %-9s %12.3f %12.3f %7.2fx %10.2g %10.2g' % (
+            r['model'], r['protocol'], r['original_us'], r['fast_us'],
+            r['speedup'], r['max_dv'], r['max_spike_shift']))
+    return '\n'.join(lines)
+
+################################
+# Running and reporting
+################################
+
+def measure(setup, run_IClamp, repeat=3, min_time=0.5):
+    """ Runs a benchmark *repeat* times, or more for fast ones, until
+    *min_time* seconds are spent. Returns a dictionary with the best wall
+    time (s), steps, steps per second and the peak memory (MB): how much
+    the first run raised the peak resident memory of the process, which
+    counts NEURON's vectors, sections and mechanisms as well as Python and
+    NumPy. Only meaningful in a fresh process, see measure_isolated. """
+    run, steps = setup(run_IClamp)
+    rss = profiling.peak_rss()
+    times = []
+    while len(times) < repeat or (sum(times) < min_time and
+            len(times) < 1000):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        if len(times) == 1:
+            peak = profiling.peak_rss() - rss
+    wall = min(times)
+    return {'wall': wall, 'steps': steps, 'steps_per_s': steps / wall,
+            'peak_mb': peak}
+
+def _measure_named(name, backend, repeat):
+    return measure(dict(BENCHMARKS)[name], get_backend(backend), repeat)
+
+def measure_isolated(name, backend='neuron', repeat=3):
+    """ measure of benchmark *name* in a new process, so that its peak
+    memory is not hidden by what earlier benchmarks allocated """
+    pool = multiprocessing.get_context('spawn').Pool(1)
+    try:
+        return pool.apply(_measure_named, (name, backend, repeat))
+    finally:
+        pool.terminate()
+
+def run_all(backend='neuron', names=None, repeat=3):
+    """ Runs the benchmarks (all, or those in *names*) with *backend*.
+    Each runs in its own process. Returns the report, as saved in JSON.
+    Benchmarks the backend cannot run get an 'error' entry. """
+    get_backend(backend)
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        try:
+            results[name] = measure_isolated(name, backend, repeat)
+        except Exception as e:
+            results[name] = {'error': '%s: %s' % (type(e).__name__, e)}
+    return {'backend': backend, 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}
+
+def compare(report, baseline, tolerance=0.2):
+    """ Returns {name: wall / baseline wall} and the names of the benchmarks
+    more than *tolerance* slower than the baseline """
+    ratios = {}
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name, {})
+        if 'wall' in result and 'wall' in base:
+            ratios[name] = result['wall'] / base['wall']
+    slower = sorted(name for name, r in ratios.items() if r > 1 + tolerance)
+    return ratios, slower
+
+def summary(report, ratios=None):
+    """ Table of the results, one line per benchmark """
+    lines = ['%-22s %10s %12s %9s %9s' % ('benchmark', 'wall [s]',
+        'steps/s', 'peak [MB]', 'vs base')]
+    for name, setup in BENCHMARKS:
+        if name not in report['results']:
+            continue
+        r = report['results'][name]
+        if 'error' in r:
+            lines.append('%-22s %s' % (name, r['error']))
+            continue
+        ratio = '%8.2fx' % ratios[name] if ratios and name in ratios else ''
+        lines.append('%-22s %10.4f %12.0f %9.2f %9s' % (name, r['wall'],
+            r['steps_per_s'], r['peak_mb'], ratio))
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description='Benchmarks of the simulation hot paths')
+    parser.add_argument('names', nargs='*', help='benchmarks to run')
+    parser.add_argument('--backend', default='neuron',
+            help='%s or module:function' % ', '.join(sorted(BACKENDS)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='../data/benchmark.json')
+    parser.add_argument('--baseline', help='JSON report to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+            help='relative slowdown flagged as a regression')
+    parser.add_argument('--mod-variants', action='store_true',
+            help='compare the original and optimized mechanisms instead')
+    args = parser.parse_args(argv)
+
+    if args.mod_variants:
+        print(mod_variants_summary(mod_variants(args.repeat)))
+        return 0
+
+    report = run_all(args.backend, args.names, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    ratios, slower = None, []
+    if args.baseline:
+        with open(args.baseline) as f:
+            ratios, slower = compare(report, json.load(f), args.tolerance)
+    print(summary(report, ratios))
+    for name in slower:
+        print("REGRESSION: %s is %.2fx slower than the baseline"
+                % (name, ratios[name]))
+    return 1 if slower else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
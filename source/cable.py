@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Pure NumPy cable solver for branched section trees (the Y-shaped
+#   dendrite of part 2), integrating many stimulus configurations at once.
+#   The tree is discretised exactly as NEURON does it (one node per segment
+#   centre, zero-area nodes at the section ends) and every time step solves
+#   the tree matrix by Hines elimination, over a batch dimension of K
+#   configurations.
+#
+#   Time stepping is the same as hhbatch: currents at t+dt/2, backward Euler
+#   for v, gating updated with the new v. Mechanisms: pas, hh (with its 1 mV
+#   rate table), hh2, ix, ixx, plus AlphaSynapses and IClamps. On the part 2
+#   tree the soma traces agree with NEURON within 1e-10 mV.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch> &
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+from hhbatch import DV, Exp, alpha, hh2_rates, hh_table, _check_warm, \
+        _inserted
+
+# Per-node mechanism parameters, and their value where the mechanism is absent
+MECHANISMS = {
+    'pas': {'g': 0., 'e': -70.},
+    'hh': {'gnabar': 0., 'gkbar': 0., 'gl': 0., 'el': -54.3},
+    'hh2': {'gnabar': 0., 'gkbar': 0., 'vtraub': -63.},
+    'ix': {'gkbar': 0.},
+    'ixx': {'gkbar': 0.},
+    }
+
+class CableTree(object):
+
+    """
+    A tree of NEURON sections, integrated with NumPy for K stimulus
+    configurations at a time.
+
+    Geometry (L, diam, nseg, Ra, cm) and mechanism parameters are read from
+    the sections when the tree is created. Stimuli are added with
+    add_synapses and add_IClamp; their amplitudes can be numbers or arrays of
+    K values, one per configuration.
+    """
+
+    def __init__(self, sections, K=1):
+        from neuron import h
+
+        self.K = K
+        self.celsius = h.celsius
+        self.ekk_ix, self.ekk_ixx = h.ekk_ix, h.ekk_ixx
+        self.synapses = []
+        self.clamps = []
+
+        parent = []     # index of the parent node
+        r = []          # axial resistance to the parent node, MOhm
+        area = []       # membrane area, um2 (0 at section ends)
+        cm = []
+        params = dict((name, dict((p, []) for p in defaults))
+                for name, defaults in MECHANISMS.items())
+        ions = {'ena': [], 'ek': []}
+
+        def add_node(p, ri, seg=None, sec=None):
+            parent.append(p)
+            r.append(ri)
+            area.append(0. if seg is None else np.pi * sec.diam * sec.L
+                    / sec.nseg)
+            cm.append(0. if seg is None else sec.cm)
+            for name, defaults in MECHANISMS.items():
+                # the fast variant of hh2, ix or ixx counts as the original
+                present = seg is not None and _inserted(sec, name)
+                for p, default in defaults.items():
+                    params[name][p].append(getattr(getattr(seg, present), p)
+                            if present else default)
+            for ion, default in (('ena', 50.), ('ek', -77.)):
+                ions[ion].append(getattr(seg, ion) if seg is not None and
+                        (sec.has_membrane('hh') or _inserted(sec, 'hh2'))
+                        else default)
+            return len(parent) - 1
+
+        # Sections in an order where parents come before their children
+        pending = list(sections)
+        # section name -> (orientation, connected end node, centres, free end
+        # node), nodes numbered from the end attached to the parent.
+        self._nodes = {}
+        while pending:
+            for sec in pending:
+                ref = h.SectionRef(sec=sec)
+                orientation = h.section_orientation(sec=sec)
+                if not ref.has_parent():
+                    start = add_node(-1, 0.)
+                    self.root = sec
+                    break
+                if h.secname(sec=ref.parent) in self._nodes:
+                    start = self._node(ref.parent,
+                            h.parent_connection(sec=sec))
+                    break
+            else:
+                raise ValueError("Sections do not form a single tree")
+            pending.remove(sec)
+
+            # Half-segment axial resistance, MOhm
+            rhalf = 1e-2 * sec.Ra * (sec.L / sec.nseg / 2) / \
+                    (np.pi * (sec.diam / 2)**2)
+            centres = []
+            node = start
+            segments = list(sec)
+            if orientation == 1: # connected by its 1 end, e.g. dend1
+                segments.reverse()
+            for j, seg in enumerate(segments):
+                node = add_node(node, rhalf if j == 0 else 2*rhalf, seg, sec)
+                centres.append(node)
+            end = add_node(node, rhalf)
+            self._nodes[h.secname(sec=sec)] = (orientation, start, centres,
+                    end)
+
+        self.parent = np.array(parent)
+        self.n = len(parent)
+        col = lambda x: np.array(x, dtype=float)[:, np.newaxis]
+        with np.errstate(divide='ignore'):
+            self.G = col(np.where(self.parent >= 0, 1 / np.array(r), 0.))
+        self.C = col(cm) * col(area) * 1e-5    # nF
+        self.mfact = col(area) * 1e-2          # mA/cm2 -> nA
+        self.params = dict((name, dict((p, col(values))
+            for p, values in ps.items())) for name, ps in params.items())
+        self.ena = col(ions['ena'])
+        self.ek = col(ions['ek'])
+
+        # Nodes carrying active channels, so the rates are only evaluated there
+        pas, hh, hh2 = [self.params[name] for name in ('pas', 'hh', 'hh2')]
+        self.hh_nodes = np.nonzero(hh['gnabar'][:, 0] + hh['gkbar'][:, 0])[0]
+        self.hh2_nodes = np.nonzero(hh2['gnabar'][:, 0] +
+                hh2['gkbar'][:, 0])[0]
+
+        # Sodium and potassium conductances in uS, and reversal potentials
+        self.hh_channels, self.hh2_channels = [[p['gnabar'][k] *
+            self.mfact[k], p['gkbar'][k] * self.mfact[k], self.ena[k],
+            self.ek[k]] for p, k in ((hh, self.hh_nodes),
+                (hh2, self.hh2_nodes))]
+
+        # Leak conductances (pas and the hh leak) lumped together, in uS
+        self.gleak = (pas['g'] + hh['gl']) * self.mfact
+        self.ileak = (pas['g'] * pas['e'] + hh['gl'] * hh['el']) * self.mfact
+        # The quadratic ix/ixx currents, as (nodes, gkbar in uS, ekk)
+        self.quadratic = []
+        for name, ekk in (('ix', self.ekk_ix), ('ixx', self.ekk_ixx)):
+            k = np.nonzero(self.params[name]['gkbar'][:, 0])[0]
+            if len(k):
+                self.quadratic.append((k,
+                    self.params[name]['gkbar'][k] * self.mfact[k], ekk))
+
+        # Children whose parent has no other child before them: their axial
+        # currents can be added to the parents in one go. The others (second
+        # branches at branch points) are added one by one.
+        seen = set()
+        self._first = []
+        self._other = []
+        for k in range(1, self.n):
+            (self._other if parent[k] in seen else self._first).append(k)
+            seen.add(parent[k])
+
+    def _node(self, sec, x):
+        """ Index of the node at position x of section sec, as NEURON maps
+        positions to nodes. """
+        from neuron import h
+
+        orientation, start, centres, end = self._nodes[h.secname(sec=sec)]
+        if x <= 0:
+            return end if orientation == 1 else start
+        if x >= 1:
+            return start if orientation == 1 else end
+        i = min(int(x * len(centres)), len(centres) - 1)
+        if orientation == 1:
+            i = len(centres) - 1 - i
+        return centres[i]
+
+    def add_synapses(self, sec, pos, gmax, onset=0, tau=2, e=0):
+        """ Adds AlphaSynapses at sec(pos) with total conductance gmax (uS,
+        a number or an array of K values), opening at *onset* ms. """
+        self.synapses.append((self._node(sec, pos), gmax, onset, tau, e))
+
+    def add_active_synapses(self, sec):
+        """ Adds the active synapses of a DefaultSection / DefaultDendrite,
+        lumping identical ones together. """
+        from neuron import h
+
+        synapses = list(sec.synapses)
+        if hasattr(sec, 'inhib_synapse'):
+            synapses.append(sec.inhib_synapse)
+        groups = {}
+        for syn in synapses:
+            if syn.gmax != 0:
+                key = (syn.get_loc(), syn.onset, syn.tau, syn.e)
+                h.pop_section() # get_loc pushes the section
+                groups[key] = groups.get(key, 0) + syn.gmax
+        for (pos, onset, tau, e), gmax in sorted(groups.items()):
+            self.add_synapses(sec, pos, gmax, onset, tau, e)
+
+    def add_IClamp(self, sec, pos=0.5, delay=0, dur=100, amp=10):
+        """ Adds a current clamp at sec(pos), amp in nA (number or array of K
+        values). """
+        self.clamps.append((self._node(sec, pos), delay, dur, amp))
+
+    def _membrane(self, v, t, m, h, n, mx, hx, nx):
+        """ Membrane current of all nodes in nA, with AlphaSynapses, and its
+        conductance dI/dv in uS (as NEURON's finite difference). """
+        g = self.gleak * np.ones_like(v)
+        i = self.gleak * v - self.ileak
+        for k, gq, ekk in self.quadratic:
+            i[k] += gq * (v[k] - ekk)**2
+            g[k] += gq * (2 * (v[k] - ekk) + DV)
+
+        for k, (gnabar, gkbar, ena, ek), (m, h, n) in (
+                (self.hh_nodes, self.hh_channels, (m, h, n)),
+                (self.hh2_nodes, self.hh2_channels, (mx, hx, nx))):
+            if len(k):
+                gna = gnabar * m*m*m*h
+                gk = gkbar * n*n*n*n
+                i[k] += gna * (v[k] - ena) + gk * (v[k] - ek)
+                g[k] += gna + gk
+
+        for node, gmax, onset, tau, e in self.synapses:
+            gsyn = gmax * alpha((t - onset) / tau)
+            i[node] += gsyn * (v[node] - e)
+            g[node] += gsyn
+        return i, g
+
+    def warm_start(self, until, dt=0.025, v_init=-70, record=None):
+        """
+        State vector of the tree just before t = *until* (as WarmStart),
+        without clamps or synapses, for run(warm=...). Returned as a
+        dictionary with the settings it was taken with, the state of all
+        nodes and the samples up to it.
+        """
+        synapses, clamps = self.synapses, self.clamps
+        self.synapses, self.clamps = [], []
+        try:
+            ts, vs = self.run(dt=dt, tstop=until - .5*dt, v_init=v_init,
+                    record=record)
+        finally:
+            self.synapses, self.clamps = synapses, clamps
+        return {'until': until, 'dt': dt, 'v_init': v_init,
+                'record': self._node(*(record or (self.root, 0.5))),
+                'state': self.state, 'ts': ts, 'vs': vs}
+
+    def run(self, dt=0.025, tstop=30, v_init=-70, record=None, warm=None):
+        """
+        Integrates the K configurations from v_init to tstop.
+
+        INPUT
+        dt - timestep in ms
+        tstop - endtime in ms
+        v_init - initial membrane potential in mV
+        record - (section, position) to record v at. Defaults to the middle
+            of the root section.
+        warm - a state from warm_start, taken with the same dt, v_init and
+            record, to start from instead of t=0. The result is the same as
+            without it, as long as the clamps and synapses start after
+            warm['until'].
+
+        Returns (t, v): t the array of time points, v a (K, len(t)) array. As
+        in run_IClamp, t=0 is not included. The final state of all nodes is
+        kept in self.state.
+        """
+        K, n, parent, G = self.K, self.n, self.parent, self.G
+        if record is None:
+            record = (self.root, 0.5)
+        rec = self._node(*record)
+        if warm is not None:
+            if warm['record'] != rec:
+                raise ValueError("warm start recorded at another node")
+            _check_warm(warm, dt, v_init, tstop,
+                    [delay for node, delay, dur, amp in self.clamps
+                        if np.any(amp)],
+                    [onset for node, gmax, onset, tau, e in self.synapses
+                        if np.any(gmax)])
+
+        hh_rates = hh_table(self.celsius)
+        hh2 = self.params['hh2']
+        tadj = 3.0 ** ((self.celsius - 36) / 10)
+        cfac = self.C / dt
+        first, other = np.array(self._first), self._other
+        edges = [(k, parent[k], G[k, 0]) for k in range(1, n)]
+
+        v = np.ones((n, K)) * v_init
+        m_inf, h_inf, n_inf = hh_rates(v[self.hh_nodes])[:3]
+        m, h, nn = m_inf.copy(), h_inf.copy(), n_inf.copy()
+        shape = (len(self.hh2_nodes), K)
+        mx, hx, nx = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+        t = 0.
+        if warm is not None:
+            t, v, m, h, nn, mx, hx, nx = warm['state']
+
+        nmax = int(np.ceil(tstop / dt)) + 2
+        ts = np.empty(nmax)
+        vs = np.empty((K, nmax))
+
+        step = 0
+        while t < tstop:
+            t += .5 * dt
+
+            # Membrane currents and their conductance, axial currents
+            i, g = self._membrane(v, t, m, h, nn, mx, hx, nx)
+            for node, delay, dur, amp in self.clamps:
+                if delay <= t < delay + dur:
+                    i[node] -= amp
+            axial = G * (v[parent] - v)
+            axial[0] = 0
+            rhs = axial - i
+            rhs[parent[first]] -= axial[first]
+            d = cfac + g + G
+            d[parent[first]] += G[first]
+            for k in other:
+                rhs[parent[k]] -= axial[k]
+                d[parent[k]] += G[k]
+
+            # Hines elimination: leaves to root, then back substitution
+            for k, p, Gk in reversed(edges):
+                f = Gk / d[k]
+                d[p] -= f * Gk
+                rhs[p] += f * rhs[k]
+            rhs[0] /= d[0]
+            for k, p, Gk in edges:
+                rhs[k] += Gk * rhs[p]
+                rhs[k] /= d[k]
+            v = v + rhs
+            t += .5 * dt
+
+            # Gating, with the new v
+            if len(self.hh_nodes):
+                m_inf, h_inf, n_inf, tau_m, tau_h, tau_n = \
+                        hh_rates(v[self.hh_nodes])
+                m = m + (1 - np.exp(-dt/tau_m)) * (m_inf - m)
+                h = h + (1 - np.exp(-dt/tau_h)) * (h_inf - h)
+                nn = nn + (1 - np.exp(-dt/tau_n)) * (n_inf - nn)
+            if len(self.hh2_nodes):
+                k = self.hh2_nodes
+                m_inf, h_inf, n_inf, tau_m, tau_h, tau_n = \
+                        hh2_rates(v[k], hh2['vtraub'][k], tadj)
+                mx = mx + (1 - Exp(-dt/tau_m)) * (m_inf - mx)
+                hx = hx + (1 - Exp(-dt/tau_h)) * (h_inf - hx)
+                nx = nx + (1 - Exp(-dt/tau_n)) * (n_inf - nx)
+
+            if step == nmax:
+                ts = np.concatenate((ts, np.empty(nmax)))
+                vs = np.concatenate((vs, np.empty((K, nmax))), axis=1)
+            ts[step] = t
+            vs[:, step] = v[rec]
+            step += 1
+
+        self.state = (t, v, m, h, nn, mx, hx, nx)
+        if warm is not None:
+            return (np.concatenate((warm['ts'], ts[:step])),
+                    np.concatenate((warm['vs'], vs[:, :step]), axis=1))
+        return ts[:step], vs[:, :step]
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   On-disk cache of current clamp runs. A run is identified by a hash of the
+#   model the recorded section belongs to (morphology, mechanisms and their
+#   parameters, point processes), of the run_IClamp arguments, of the .mod
+#   files and of the NEURON version, so a script that is run again only
+#   simulates what changed. Traces are stored as compressed .npz files, and
+#   the least recently used ones are removed when the cache grows too big.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 7 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import glob
+import hashlib
+
+import neuron
+import numpy as np
+
+from simulation import run_IClamp
+
+h = neuron.h
+
+# Global parameters that change the dynamics, besides the RANGE parameters
+GLOBALS = ['celsius', 'ekk_ix', 'ekk_ixx', 'taumax_ix', 'taumax_ixx',
+        'usetable_hh2f', 'ekk_ixf', 'ekk_ixxf', 'taumax_ixf', 'taumax_ixxf']
+
+def _mechanism_names(kind):
+    """ Names of the density (kind 0) or point process (kind 1) mechanisms """
+    mt = h.MechanismType(kind)
+    name = h.ref('')
+    names = []
+    for i in range(int(mt.count())):
+        mt.select(i)
+        mt.selected(name)
+        names.append(name[0])
+    return names
+
+# mechanism -> (MechanismStandard, names of its PARAMETERs), made once
+_standards = {}
+
+def _parameters(mechanism, obj):
+    """ Values of the PARAMETERs of *mechanism* in a segment or point
+    process """
+    if mechanism not in _standards:
+        ms = h.MechanismStandard(mechanism, 1)
+        name = h.ref('')
+        names = []
+        for i in range(int(ms.count())):
+            ms.name(name, i)
+            names.append(name[0])
+        _standards[mechanism] = (ms, names)
+    ms, names = _standards[mechanism]
+    getattr(ms, 'in')(obj)
+    return [(name, ms.get(name)) for name in names]
+
+def _mechanisms():
+    """ Names of the density mechanisms and of the point processes a
+    section can hold """
+    density = [m for m in _mechanism_names(0)
+            if m not in ('morphology', 'capacitance') and
+            not m.endswith('_ion')]
+    return density, _mechanism_names(1)
+
+def section_state(sec, mechanisms=None):
+    """
+    Returns a description of the segments of section *sec*, as in
+    model_state: geometry, mechanism parameters, reversal potentials and
+    point processes. Two sections with the same description simulate the
+    same way, given the same neighbours.
+
+    mechanisms - (density, point) mechanism names, from _mechanisms()
+    """
+    density, point = mechanisms or _mechanisms()
+    state = []
+    inserted = [m for m in density if sec.has_membrane(m)]
+    for seg in sec:
+        state.append(('segment', seg.x, seg.diam, seg.cm))
+        for mechanism in inserted:
+            state.append((mechanism, _parameters(mechanism, seg)))
+        for ion in ('na', 'k'):
+            if sec.has_membrane(ion + '_ion'):
+                state.append(('e' + ion, getattr(seg, 'e' + ion)))
+
+    mt = h.MechanismType(1)
+    for mechanism in point:
+        mt.select(mechanism)
+        pp = mt.pp_begin(sec=sec)
+        while pp is not None:
+            x = pp.get_loc()
+            h.pop_section()
+            state.append((mechanism, x, _parameters(mechanism, pp)))
+            pp = mt.pp_next()
+    return state
+
+def _tree(sec):
+    """ Sections of the tree *sec* belongs to, in creation order """
+    tree = h.SectionList()
+    tree.wholetree(sec=sec)
+    names = set(h.secname(sec=s) for s in tree)
+    return [s for s in h.allsec() if h.secname(sec=s) in names]
+
+def model_state(sec=None):
+    """
+    Returns a description of everything in the model that changes a
+    simulation: global parameters, and for every section (in creation order)
+    its place in the tree, geometry, mechanism parameters, reversal
+    potentials and point processes. State variables are left out, they are
+    reset by finitialize.
+
+    sec - only describe the tree of this section, which does not depend on
+        the other cells of the process. All sections by default.
+    """
+    state = [(name, getattr(h, name)) for name in GLOBALS if hasattr(h, name)]
+    mechanisms = _mechanisms()
+
+    sections = list(h.allsec()) if sec is None else _tree(sec)
+    index = dict((h.secname(sec=sec), i) for i, sec in enumerate(sections))
+    for sec in sections:
+        ref = h.SectionRef(sec=sec)
+        parent = index[h.secname(sec=ref.parent)] if ref.has_parent() else -1
+        state.append(('section', parent, h.parent_connection(sec=sec),
+            h.section_orientation(sec=sec), sec.L, sec.nseg, sec.Ra))
+        state.extend(section_state(sec, mechanisms))
+
+    return state
+
+_mod_hash = None
+
+def mod_hash():
+    """ Hash of the .mod files next to this module, which the compiled
+    mechanisms are built from """
+    global _mod_hash
+    if _mod_hash is None:
+        sha = hashlib.sha1()
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(folder, '*.mod'))):
+            sha.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                sha.update(f.read())
+        _mod_hash = sha.hexdigest()
+    return _mod_hash
+
+def run_key(sec, **kwargs):
+    """ Hash of the state of the tree of *sec*, the recorded section, the
+    run_IClamp arguments, the .mod files and the NEURON version """
+    sections = [h.secname(sec=s) for s in _tree(sec)]
+    description = repr((model_state(sec), sections.index(h.secname(sec=sec)),
+        sorted(kwargs.items()), mod_hash(), neuron.__version__))
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+class RunCache(object):
+
+    """
+    Cache of run_IClamp traces in *folder*, holding at most max_bytes. hits
+    and misses count the runs found in, and missing from, the cache.
+    """
+
+    def __init__(self, folder='../data/cache', max_bytes=500e6):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + '.npz')
+
+    def run_IClamp(self, sec, **kwargs):
+        """ Same as run_IClamp (keyword arguments only), returning the cached
+        trace when there is one. Runs with stop or reducers are not cached,
+        and a WarmStart is left out of the key. """
+        if 'stop' in kwargs or 'reducers' in kwargs:
+            return run_IClamp(sec, **kwargs)
+
+        # A warm start does not change the result
+        key = dict((k, v) for k, v in kwargs.items() if k != 'warm')
+        path = self._path(run_key(sec, **key))
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path, None) # most recently used
+            return np.load(path)['data']
+
+        self.misses += 1
+        data = run_IClamp(sec, **kwargs)
+        np.savez_compressed(path, data=data)
+        self.evict()
+        return data
+
+    def files(self):
+        """ Cached files, least recently used first """
+        paths = [os.path.join(self.folder, f) for f in os.listdir(self.folder)
+                if f.endswith('.npz')]
+        return sorted(paths, key=os.path.getmtime)
+
+    def size(self):
+        """ Total size of the cache, in bytes """
+        return sum(os.path.getsize(path) for path in self.files())
+
+    def evict(self):
+        """ Removes least recently used files until the cache fits in
+        max_bytes """
+        paths = self.files()
+        size = sum(os.path.getsize(path) for path in paths)
+        while paths and size > self.max_bytes:
+            path = paths.pop(0)
+            size -= os.path.getsize(path)
+            os.remove(path)
+
+    def clear(self):
+        """ Removes all cached files """
+        for path in self.files():
+            os.remove(path)
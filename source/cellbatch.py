@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Batches of cells in one NEURON simulation. A sweep over currents or
+#   synapse counts normally calls run_IClamp once per point, each call
+#   paying for finitialize, the hoc loop and the Python around them. Here K
+#   independent copies of a registered model (toolset.models) are built side
+#   by side, each with its own IClamp and synapses, and one run integrates
+#   all of them. Every copy is recorded into its own Vector.
+#
+#   The copies do not interact, and NEURON solves each of them exactly as it
+#   solves a single cell, so the traces are the same as those of run_IClamp
+#   on the model, point by point.
+#
+#   The cells of a batch can also be spread over threads (ParallelContext
+#   nthread), so one process uses every core with a single copy of
+#   everything else, instead of a pool of processes each building the
+#   model. The traces do not depend on the number of threads.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import multiprocessing
+
+import neuron
+import numpy as np
+
+import profiling
+import simulation
+from simulation import _advance, _stride
+from cache import section_state, _mechanisms
+from toolset import models
+
+h = neuron.h
+
+class CellBatch(object):
+
+    """
+    K copies of model *name* of toolset.models, simulated together.
+
+    cells is the list of the K copies, each what models.get(name) returns:
+    a section (HH, HHx, ...) or a tuple of sections (the part 2 tree). They
+    start with their synapses inactive; set each one up as needed before
+    run, e.g.
+
+        batch = CellBatch('HH', len(Ns))
+        for cell, N in zip(batch.cells, Ns):
+            cell.activate_synapses(N=N, onset=10)
+        t, v = batch.run(amp=0, tstop=50, dt=0.01)
+
+    NEURON simulates every section that exists, so while the copies exist
+    they are also integrated by the other runs of the process. Delete the
+    batch when it is no longer needed.
+    """
+
+    @profiling.timed('setup')
+    def __init__(self, name, K):
+        self.name = name
+        self.K = K
+        self.celsius = models.MODELS[name][1]
+        self.cells = models.copies(name, K)
+
+    def __len__(self):
+        return self.K
+
+    def sections(self, index=None):
+        """ Section *index* of the tuple of every cell, or the cells
+        themselves for a single section model (index None) """
+        if index is None:
+            return list(self.cells)
+        return [cell[index] for cell in self.cells]
+
+    def copy_synapses(self, model):
+        """
+        Gives the synapses of every copy the conductance and onset of those
+        of *model*, what models.get(name) returns. Raises ValueError if model
+        differs from the copies in any other way (parameters changed since
+        it was built, synapses added...), the copies would not behave as
+        model then.
+        """
+        originals = model if isinstance(model, tuple) else (model,)
+        for cell in self.cells:
+            copies = cell if isinstance(cell, tuple) else (cell,)
+            for original, copy in zip(originals, copies):
+                for syn, syn_copy in zip(original.synapses, copy.synapses):
+                    syn_copy.gmax = syn.gmax
+                    syn_copy.onset = syn.onset
+
+        # The copies are all alike, comparing one of them is enough
+        mechanisms = _mechanisms()
+        for original, copy in zip(originals, copies):
+            if section_state(original, mechanisms) != \
+                    section_state(copy, mechanisms):
+                raise ValueError("CellBatch: %s differs from the %s model "
+                        "it was built as" % (getattr(original, 'name',
+                            h.secname(sec=original)), self.name))
+
+    def run(self, sec=None, pos=0.5, delay=0, dur=100, amp=10, dt=0.025,
+            tstop=30, v_init=-70, var='v', rec_sec=None, rec_pos=0.5,
+            record_every=None, threads=1):
+        """
+        Simulate a current clamp measurement on every cell, with the
+        arguments of run_IClamp. delay, dur and amp may be arrays of K values,
+        one per cell.
+
+        Returns (t, v): t the array of time points, v a (K, len(t)) array of
+        the recorded *var* of each cell, as SomaBatch.run. t=0 is not
+        included, and the samples are those run_IClamp gives for each cell on
+        its own. spike_stats(v, t) analyses them all at once.
+
+        INPUT
+        sec - index of the clamped section in the tuple of a cell (0 for the
+            soma of the tree), None for a single section model
+        rec_sec - index of the recorded section, sec by default
+        record_every - keep one sample every record_every ms, as in
+            run_IClamp
+        threads - number of threads the cells are spread over, None for one
+            per core. NEURON gives each thread whole cells, balancing their
+            number of compartments, and with more than one thread lays out
+            the memory of each thread contiguously (CVode.cache_efficient).
+            There are never more threads than cells. Every mechanism must
+            be thread safe: recompile the .mod files (nrnivmodl) if NEURON
+            says hh2 is not.
+            Threads only pay off when each step has enough work, e.g. tens
+            of trees; the settings of NEURON are restored after the run.
+        """
+        K = self.K
+        if rec_sec is None:
+            rec_sec = sec
+        stride = _stride(record_every, dt)
+        delay, dur, amp = [np.ones(K) * x for x in (delay, dur, amp)]
+
+        stims = []
+        for k, target in enumerate(self.sections(sec)):
+            stim = h.IClamp(pos, sec=target)
+            stim.delay = delay[k]
+            stim.dur = dur[k]
+            stim.amp = amp[k]
+            stims.append(stim)
+
+        # One time vector for all cells, one vector of var per cell
+        t_rec = h.Vector()
+        v_recs = [h.Vector() for k in range(K)]
+        refs = [getattr(target(rec_pos), '_ref_' + var)
+                for target in self.sections(rec_sec)]
+        if stride > 1:
+            t_rec.record(h._ref_t, stride * dt)
+            for v_rec, ref in zip(v_recs, refs):
+                v_rec.record(ref, stride * dt)
+        else:
+            t_rec.record(h._ref_t)
+            for v_rec, ref in zip(v_recs, refs):
+                v_rec.record(ref)
+
+        h.celsius = self.celsius
+        h.dt = dt
+        with _threaded(threads, K):
+            with profiling.span('finitialize', cells=K):
+                h.finitialize(v_init)
+                h.fcurrent()
+
+            # same loop and stopping rule as run_IClamp
+            epsilon = h.float_epsilon
+            h.float_epsilon = 0
+            try:
+                _advance(tstop)
+            finally:
+                h.float_epsilon = epsilon
+
+        with profiling.span('record'):
+            t = np.array(t_rec)[1:]
+            v = np.empty((K, len(t)))
+            for k, v_rec in enumerate(v_recs):
+                v[k] = np.array(v_rec)[1:]
+        return t, v
+
+class _threaded(object):
+
+    """ Runs the block with the *cells* cells spread over *threads* threads
+    (None for one per core), then goes back to the previous thread count
+    and memory layout """
+
+    def __init__(self, threads, cells):
+        self.threads = max(1, min(threads or multiprocessing.cpu_count(),
+            cells))
+
+    def __enter__(self):
+        self.pc = h.ParallelContext()
+        self.cvode = h.CVode()
+        self.previous = (int(self.pc.nthread()),
+                int(self.cvode.cache_efficient()))
+        if self.threads != self.previous[0]:
+            self.pc.nthread(self.threads)
+        if self.threads > 1:
+            self.cvode.cache_efficient(1)
+
+    def __exit__(self, *exc):
+        threads, efficient = self.previous
+        if int(self.pc.nthread()) != threads:
+            self.pc.nthread(threads)
+        self.cvode.cache_efficient(efficient)
+
+def run_IClamp(sec, pos=0.5, delay=0, dur=100, amp=10, dt=0.025, tstop=30,
+        v_init=-70, var='v', rec_pos=0.5, record_every=None, threads=1):
+    """
+    Drop-in replacement for run_IClamp on a section of a registered model
+    (what models.get returns, or one of its sections), as
+    hhbatch.run_IClamp.
+
+    If *amp* is a sequence of K amplitudes, a CellBatch of K copies of the
+    model is run at once, with the synapses of the model (copy_synapses),
+    and a list of K (time, voltage) arrays is returned, the cells spread
+    over *threads* threads (see CellBatch.run). Otherwise this is run_IClamp
+    itself.
+    """
+    if np.ndim(amp) == 0:
+        return simulation.run_IClamp(sec, pos, delay, dur, amp, dt, tstop,
+                v_init, var, rec_pos, record_every=record_every)
+    found = models.find(sec)
+    if found is None:
+        raise ValueError("cellbatch: %s is not part of a registered model"
+                % h.secname(sec=sec))
+    name, index = found
+
+    batch = CellBatch(name, len(amp))
+    batch.copy_synapses(models.get(name))
+    t, v = batch.run(index, pos, delay, dur, amp, dt, tstop, v_init, var,
+            rec_pos=rec_pos, record_every=record_every, threads=threads)
+    return [np.transpose([t, vk]) for vk in v]
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Settings of the tests (test_*.py), run with pytest from this folder:
+#
+#       nrnivmodl && python -m pytest -q
+#
+#   The compiled mechanisms (hh2, ix, ixx and their fast variants) are
+#   loaded from the x86_64 folder nrnivmodl makes here. Tests that need them
+#   take the mechanisms fixture, and are skipped when they are missing.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+
+import pytest
+import neuron
+
+from cache import _mechanism_names
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _compiled():
+    return 'hh2' in _mechanism_names(0)
+
+# NEURON only loads them by itself when started in this folder
+if not _compiled() and os.path.isdir(os.path.join(HERE, 'x86_64')):
+    neuron.load_mechanisms(HERE)
+
+@pytest.fixture
+def mechanisms():
+    """ Skips the test if the .mod files are not compiled """
+    if not _compiled():
+        pytest.skip("compile the .mod files with nrnivmodl first")
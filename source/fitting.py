@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Fitting of the channel parameters of the part 1 somata (gnabar_hh2,
+#   gkbar_hh2, vtraub_hh2, gkbar_ix, g_pas, ...) to target behaviour: spike
+#   frequencies at given currents (an f-I curve, as in prob1_2) or a voltage
+#   trace (e.g. one of Skander's examples).
+#
+#   The optimizer is a differential evolution, which moves a whole
+#   population of parameter sets at a time. Every generation is evaluated
+#   as one hhbatch.SomaBatch per target, with one cell per (parameter set,
+#   current) pair. Parameter sets are snapped to a fine grid, and the cost
+#   of every set is kept, so a set that comes up again (the population
+#   converging, another run of the same fitter) is not simulated again.
+#
+#       fitter = Fitter(models.get('HHx'), [FICurve(I, f)],
+#               ['gkbar_hh2', 'gkbar_ix'])
+#       result = fitter.run(popsize=20, generations=40)
+#       apply(HHx, result['params'])
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+import profiling
+from hhbatch import SomaBatch, soma_parameters, _inserted, PARAMETERS
+from analysis import spike_stats
+
+# Parameters fitted by default
+FREE = ['gnabar_hh2', 'gkbar_hh2', 'vtraub_hh2', 'gkbar_ix', 'g_pas']
+
+################################
+# Targets
+################################
+
+# A target describes a current clamp protocol (the arguments of
+# SomaBatch.run, and the currents as amps), how to reduce the (K, n)
+# voltages of the run to features, one row per cell, and the cost of the
+# features of one parameter set (rows for each current) against the
+# reference.
+
+class FICurve(object):
+
+    """
+    Spike frequencies at the currents *amps*: the cost is the mean squared
+    difference with *freqs* (kHz, as spikefreq), weighted by *weights*.
+    """
+
+    def __init__(self, amps, freqs, delay=0, dur=100, tstop=100, dt=0.025,
+            v_init=-70, v_th=0, weights=None):
+        self.amps = np.asarray(amps, dtype=float)
+        self.freqs = np.asarray(freqs, dtype=float)
+        if self.freqs.shape != self.amps.shape:
+            raise ValueError("FICurve: one frequency per current")
+        self.clamp = {'delay': delay, 'dur': dur, 'tstop': tstop, 'dt': dt,
+                'v_init': v_init}
+        self.v_th = v_th
+        self.weights = np.ones(len(self.amps)) if weights is None else \
+                np.asarray(weights, dtype=float)
+
+    def features(self, t, v):
+        return spike_stats(v, t, v_th=self.v_th, interpolate=False)['freq'] \
+                [:, np.newaxis]
+
+    def cost(self, features):
+        """ features - (number of currents, 1) frequencies of one set """
+        f = features[:, 0]
+        return np.sum(self.weights * (f - self.freqs)**2) / \
+                np.sum(self.weights)
+
+class VoltageTrace(object):
+
+    """
+    A voltage trace under the current *amp*: the cost is the root mean
+    square difference (mV) with the v column of *data*, [time, v] rows as
+    run_IClamp returns them, run with the same delay, dur, tstop and dt.
+    """
+
+    def __init__(self, data, amp, delay=0, dur=100, tstop=100, dt=0.025,
+            v_init=-70):
+        self.v = np.asarray(data)[:, 1]
+        self.amps = np.array([amp], dtype=float)
+        self.clamp = {'delay': delay, 'dur': dur, 'tstop': tstop, 'dt': dt,
+                'v_init': v_init}
+
+    def features(self, t, v):
+        if v.shape[1] != len(self.v):
+            raise ValueError("VoltageTrace: the reference has %d samples, "
+                    "the runs %d" % (len(self.v), v.shape[1]))
+        return v
+
+    def cost(self, features):
+        return np.sqrt(np.mean((features[0] - self.v)**2))
+
+################################
+# Batched evaluation
+################################
+
+def default_bounds(params, names):
+    """ Search interval of every parameter in *names*, around its value in
+    *params*: a factor of 4 either way for conductances (0 to 1e-3 S/cm2
+    when they are 0), +-10 mV for vtraub """
+    bounds = []
+    for name in names:
+        value = params[name]
+        if name.startswith('vtraub'):
+            bounds.append((value - 10, value + 10))
+        elif value == 0:
+            bounds.append((0, 1e-3))
+        else:
+            bounds.append((value / 4, value * 4))
+    return bounds
+
+class Fitter(object):
+
+    """
+    Fits the parameters *names* of the soma *sec* (a section of toolset,
+    read by soma_parameters) to the *targets*, the sum of their costs being
+    minimised. The other parameters keep the values of sec. By default,
+    names are those of FREE whose mechanism sec has.
+
+    bounds - (low, high) of every parameter, default_bounds by default
+    resolution - parameter sets are snapped to steps of resolution times
+        the width of the bounds, so that sets met again are not simulated
+        again. None to never snap (sets are only reused when identical).
+    """
+
+    def __init__(self, sec, targets, names=None, bounds=None,
+            resolution=1e-4):
+        if names is None:
+            names = [name for name in FREE
+                    if _inserted(sec, name.split('_', 1)[1])]
+        for name in names:
+            if name not in PARAMETERS:
+                raise ValueError("Unknown soma parameter '%s'" % name)
+        self.params = soma_parameters(sec)
+        self.targets = list(targets)
+        self.names = list(names)
+        if bounds is None:
+            bounds = default_bounds(self.params, self.names)
+        self.lo, self.hi = np.array(bounds, dtype=float).transpose()
+        self.resolution = resolution
+        # (target index, parameter set) -> cost of the set
+        self.cache = {}
+        self.simulated = 0
+        self.reused = 0
+
+    def snap(self, X):
+        """ Parameter sets X (one per row), within the bounds and on the
+        grid of the resolution """
+        X = np.clip(X, self.lo, self.hi)
+        if self.resolution is None:
+            return X
+        step = (self.hi - self.lo) * self.resolution
+        step[step == 0] = 1
+        return np.clip(self.lo + np.round((X - self.lo) / step) * step,
+                self.lo, self.hi)
+
+    def _simulate(self, target, X):
+        """ Costs of every parameter set of X for *target*, all sets and
+        currents simulated in one batch """
+        C = len(target.amps)
+        params = dict(self.params)
+        for name, column in zip(self.names, X.transpose()):
+            params[name] = np.repeat(column, C)
+        batch = SomaBatch(len(X) * C, **params)
+        t, v = batch.run(amp=np.tile(target.amps, len(X)), **target.clamp)
+        features = target.features(t, v)
+        features = features.reshape((len(X), C) + features.shape[1:])
+        return [target.cost(f) for f in features]
+
+    @profiling.timed('fitting')
+    def evaluate(self, X):
+        """ Total cost of every parameter set (row) of X. Sets that were
+        evaluated before are taken from the cache, the others are simulated
+        together. """
+        X = np.atleast_2d(X)
+        costs = np.zeros(len(X))
+        keys = [tuple(x) for x in X]
+        for k, target in enumerate(self.targets):
+            new = sorted(set(key for key in keys
+                if (k, key) not in self.cache))
+            if new:
+                for key, cost in zip(new,
+                        self._simulate(target, np.array(new))):
+                    self.cache[k, key] = cost
+            self.simulated += len(new)
+            self.reused += len(X) - len(new)
+            costs += [self.cache[k, key] for key in keys]
+        return costs
+
+    def run(self, popsize=20, generations=50, F=0.7, CR=0.9, seed=None,
+            tol=0, verbose=False):
+        """
+        Fits by differential evolution (see differential_evolution). Returns
+        a dictionary: params, the best parameters by name; cost, their
+        cost; history, the best cost after each generation; simulated and
+        reused, the number of parameter sets simulated and taken from the
+        cache, for all targets, since the fitter was made.
+        """
+        def report(generation, pop, cost):
+            if verbose:
+                print("generation %d: best cost %g (%d simulated, %d "
+                        "reused)" % (generation, cost.min(), self.simulated,
+                            self.reused))
+
+        x, cost, history = differential_evolution(self.evaluate, self.lo,
+                self.hi, popsize, generations, F, CR, seed, tol,
+                snap=self.snap, callback=report)
+        return {'params': dict(zip(self.names, x)), 'cost': cost,
+                'history': history, 'simulated': self.simulated,
+                'reused': self.reused}
+
+################################
+# Optimizer
+################################
+
+def differential_evolution(evaluate, lo, hi, popsize=20, generations=50,
+        F=0.7, CR=0.9, seed=None, tol=0, snap=None, callback=None):
+    """
+    Minimises evaluate over the box [lo, hi] with differential evolution
+    (DE/rand/1/bin). Returns (best x, its cost, best cost after each
+    generation).
+
+    INPUT
+    evaluate - function of an array of parameter sets (one per row),
+        returning the array of their costs. It is called once per
+        generation, with the whole population.
+    lo, hi - arrays of the bounds of every parameter
+    popsize - number of parameter sets in the population, at least 4
+    generations - maximum number of generations
+    F - differential weight, CR - crossover probability
+    seed - seed of the random numbers, for repeatable fits
+    tol - stop once the best cost is at most tol
+    snap - function applied to every new population, e.g. Fitter.snap
+    callback - called as callback(generation, population, costs)
+    """
+    if popsize < 4:
+        raise ValueError("differential_evolution: popsize must be at least "
+                "4")
+    if snap is None:
+        snap = lambda X: np.clip(X, lo, hi)
+    rng = np.random.RandomState(seed)
+    n = len(lo)
+
+    pop = snap(lo + rng.rand(popsize, n) * (hi - lo))
+    cost = evaluate(pop)
+    history = [cost.min()]
+    for generation in range(generations):
+        if cost.min() <= tol:
+            break
+        # a + F (b - c), from three other members of the population
+        others = np.array([rng.permutation(np.delete(np.arange(popsize),
+            i))[:3] for i in range(popsize)])
+        a, b, c = pop[others[:, 0]], pop[others[:, 1]], pop[others[:, 2]]
+        mutant = a + F * (b - c)
+        # binomial crossover, at least one parameter from the mutant
+        cross = rng.rand(popsize, n) < CR
+        cross[np.arange(popsize), rng.randint(n, size=popsize)] = True
+        trial = snap(np.where(cross, mutant, pop))
+
+        trial_cost = evaluate(trial)
+        better = trial_cost <= cost
+        pop[better] = trial[better]
+        cost[better] = trial_cost[better]
+        history.append(cost.min())
+        if callback is not None:
+            callback(generation, pop, cost)
+
+    best = np.argmin(cost)
+    return pop[best], cost[best], history
+
+################################
+# Results
+################################
+
+def apply(sec, params):
+    """ Sets the fitted *params* (name: value) on the soma *sec*. Raises
+    ValueError for a parameter of a mechanism sec does not have. """
+    from neuron import h
+
+    seg = sec(0.5)
+    for name, value in params.items():
+        if name in ('L', 'diam', 'cm'):
+            setattr(sec, name, value)
+        elif name == 'celsius':
+            h.celsius = value
+        elif name in ('ena', 'ek'):
+            setattr(seg, name, value)
+        else:
+            parameter, mechanism = name.split('_', 1)
+            inserted = _inserted(sec, mechanism)
+            if inserted is None:
+                raise ValueError("apply: %s has no %s mechanism" %
+                        (getattr(sec, 'name', h.secname(sec=sec)),
+                            mechanism))
+            if parameter == 'ekk':
+                # a GLOBAL of ix and ixx
+                setattr(h, 'ekk_' + inserted, value)
+            else:
+                setattr(getattr(seg, inserted), parameter, value)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Pure NumPy integration of single-compartment somata (HH, HHx, HHxx of
+#   part 1), many cells at a time. Every cell is a row of the state arrays, so
+#   a whole f-I curve is one pass of vector operations instead of one NEURON
+#   run per current.
+#
+#   The scheme is the one NEURON uses for fixed steps (secondorder=0):
+#   membrane currents are evaluated at t+dt/2 and linearised with a 0.001 mV
+#   finite difference, v is advanced by backward Euler, then the gating
+#   variables are updated with the new v. The channel kinetics are copied
+#   from HH_traub.mod (hh2), I_x1.mod (ix) and I_x2.mod (ixx).
+#
+#   Tolerance: against NEURON 9 traces of the part 1 protocols (Skander
+#   examples, the prob1_2 f-I sweep, prob1_3 synaptic runs) the voltages
+#   agree within 1e-9 mV, and the number of samples and the time points are
+#   identical. The only differences are floating point round-off.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+# Voltage step NEURON uses to compute the conductance dI/dv of a mechanism
+DV = 0.001
+
+################################
+# Channel kinetics
+################################
+
+def Exp(x):
+    """ exp(x), set to 0 below -100 (HH_traub.mod) """
+    return np.where(x < -100, 0., np.exp(np.maximum(x, -100)))
+
+def vtrap(x, y):
+    """ x / (exp(x/y) - 1), with the limit around x = 0 (HH_traub.mod) """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trap = x / (Exp(x/y) - 1)
+    return np.where(np.abs(x/y) < 1e-6, y*(1 - x/y/2), trap)
+
+def hh2_rates(v, vtraub, tadj):
+    """
+    Returns the steady states and time constants (m_inf, h_inf, n_inf, tau_m,
+    tau_h, tau_n) of the hh2 mechanism, as evaluate_fct in HH_traub.mod.
+    """
+    v2 = v - vtraub # convert to traub convention
+
+    a = 0.32 * vtrap(13-v2, 4)
+    b = 0.28 * vtrap(v2-40, 5)
+    tau_m = 1 / (a + b) / tadj
+    m_inf = a / (a + b)
+
+    a = 0.128 * Exp((17-v2)/18)
+    b = 4 / ( 1 + Exp((40-v2)/5) )
+    tau_h = 1 / (a + b) / tadj
+    h_inf = a / (a + b)
+
+    a = 0.032 * vtrap(15-v2, 5)
+    b = 0.5 * Exp((10-v2)/40)
+    tau_n = 1 / (a + b) / tadj
+    n_inf = a / (a + b)
+
+    return m_inf, h_inf, n_inf, tau_m, tau_h, tau_n
+
+def hh_rates(v, celsius):
+    """
+    Returns (m_inf, h_inf, n_inf, tau_m, tau_h, tau_n) of NEURON's built-in
+    hh mechanism, as its rates procedure.
+    """
+    q10 = 3 ** ((celsius - 6.3)/10)
+
+    a = .1 * vtrap(-(v+40), 10)
+    b = 4 * np.exp(-(v+65)/18)
+    tau_m = 1 / (q10 * (a + b))
+    m_inf = a / (a + b)
+
+    a = .07 * np.exp(-(v+65)/20)
+    b = 1 / (np.exp(-(v+35)/10) + 1)
+    tau_h = 1 / (q10 * (a + b))
+    h_inf = a / (a + b)
+
+    a = .01 * vtrap(-(v+55), 10)
+    b = .125 * np.exp(-(v+65)/80)
+    tau_n = 1 / (q10 * (a + b))
+    n_inf = a / (a + b)
+
+    return m_inf, h_inf, n_inf, tau_m, tau_h, tau_n
+
+def hh_table(celsius):
+    """ Returns a function v -> hh_rates(v, celsius), interpolated in a 1 mV
+    table from -100 to 100 mV like the TABLE statement of hh.mod. """
+    vt = np.linspace(-100, 100, 201)
+    table = hh_rates(vt, celsius)
+    return lambda v: [np.interp(v, vt, column) for column in table]
+
+def alpha(x):
+    """ Time course of the AlphaSynapse conductance, zero outside 0..10 """
+    return np.where((x < 0) | (x > 10), 0., x * np.exp(1 - x))
+
+################################
+# Batch of somata
+################################
+
+# Parameters of a soma, with the NEURON defaults for the geometry and the
+# values used when a mechanism is not inserted (zero conductance).
+PARAMETERS = {
+    'L': 100., 'diam': 500., 'cm': 1.,
+    'g_pas': 0., 'e_pas': -70.,
+    'gnabar_hh2': 0., 'gkbar_hh2': 0., 'vtraub_hh2': -63.,
+    'ena': 50., 'ek': -77.,
+    'gkbar_ix': 0., 'ekk_ix': -70.,
+    'gkbar_ixx': 0., 'ekk_ixx': -65.,
+    'celsius': 6.3,
+    }
+
+# The optimized mechanisms of the *_fast.mod files have the same equations
+# as the originals, and are read as them. The rates are always computed
+# exactly here, while hh2f reads them from tables.
+FAST_VARIANTS = {'hh2': 'hh2f', 'ix': 'ixf', 'ixx': 'ixxf'}
+
+def _inserted(sec, name):
+    """ Mechanism *name* or its fast variant, whichever is inserted in sec,
+    or None """
+    for mechanism in (name, FAST_VARIANTS.get(name)):
+        if mechanism and sec.has_membrane(mechanism):
+            return mechanism
+
+# Density mechanisms SomaBatch integrates
+SUPPORTED = ('pas', 'hh2', 'hh2f', 'ix', 'ixf', 'ixx', 'ixxf')
+
+def soma_parameters(sec):
+    """
+    Reads the parameters of a single-compartment section (a DefaultSection of
+    toolset) into a dictionary, to be passed to SomaBatch. Mechanisms that are
+    not inserted get zero conductance. Raises ValueError if sec has a
+    mechanism SomaBatch does not integrate (NEURON's hh, ...), which would be
+    missing from the batched traces.
+    """
+    from neuron import h
+
+    unsupported = [mech.name() for mech in sec(0.5)
+            if not mech.name().endswith('_ion')
+            and mech.name() not in SUPPORTED]
+    if unsupported:
+        raise ValueError("hhbatch: %s has the mechanisms %s, only %s can be "
+                "integrated" % (h.secname(sec=sec), ', '.join(unsupported),
+                    ', '.join(SUPPORTED)))
+
+    params = dict(PARAMETERS)
+    params['L'] = sec.L
+    params['diam'] = sec.diam
+    params['cm'] = sec.cm
+    params['celsius'] = h.celsius
+
+    seg = sec(0.5)
+    if sec.has_membrane('pas'):
+        params['g_pas'] = seg.pas.g
+        params['e_pas'] = seg.pas.e
+    hh2 = _inserted(sec, 'hh2')
+    if hh2:
+        params['gnabar_hh2'] = getattr(seg, hh2).gnabar
+        params['gkbar_hh2'] = getattr(seg, hh2).gkbar
+        params['vtraub_hh2'] = getattr(seg, hh2).vtraub
+        params['ena'] = seg.ena
+        params['ek'] = seg.ek
+    for name in ('ix', 'ixx'):
+        mechanism = _inserted(sec, name)
+        if mechanism:
+            params['gkbar_' + name] = getattr(seg, mechanism).gkbar
+            params['ekk_' + name] = getattr(h, 'ekk_' + mechanism)
+
+    return params
+
+class SomaBatch(object):
+
+    """
+    K single-compartment somata, integrated in lockstep.
+
+    Every parameter (see PARAMETERS) is either a number, shared by all cells,
+    or an array of K values, one per cell. Synapses are added in groups of
+    identical AlphaSynapses with add_synapses.
+    """
+
+    def __init__(self, K=1, **params):
+        self.K = K
+        self.params = dict(PARAMETERS)
+        for name, value in params.items():
+            if name not in PARAMETERS:
+                raise ValueError("Unknown soma parameter '%s'" % name)
+            self.params[name] = value
+        self.synapses = []
+
+    @classmethod
+    def from_section(cls, sec, K=1, **params):
+        """ Batch of K copies of section *sec*, including its active
+        synapses. Parameters given as keywords replace those of sec. """
+        p = soma_parameters(sec)
+        p.update(params)
+        batch = cls(K, **p)
+
+        # Identical synapses are lumped together
+        groups = {}
+        for syn in sec.synapses:
+            if syn.gmax != 0:
+                key = (syn.onset, syn.tau, syn.e)
+                groups[key] = groups.get(key, 0) + syn.gmax
+        for (onset, tau, e), gmax in sorted(groups.items()):
+            batch.add_synapses(gmax, onset, tau, e)
+        return batch
+
+    def add_synapses(self, gmax, onset=0, tau=2, e=0):
+        """ Adds AlphaSynapses with total conductance gmax (uS, number or
+        array of K values), opening at *onset* ms. """
+        self.synapses.append((gmax, onset, tau, e))
+
+    def _param(self, name):
+        return np.ones(self.K) * self.params[name]
+
+    def warm_start(self, until, dt=0.025, v_init=-70):
+        """
+        State vector of the cells just before t = *until* (as WarmStart),
+        without stimulus or synapses, for run(warm=...). Returned as a
+        dictionary with the settings it was taken with, the state (t, v, m,
+        h, n) and the samples up to it.
+        """
+        synapses, self.synapses = self.synapses, []
+        try:
+            ts, vs = self.run(amp=0, dt=dt, tstop=until - .5*dt,
+                    v_init=v_init)
+        finally:
+            self.synapses = synapses
+        return {'until': until, 'dt': dt, 'v_init': v_init,
+                'state': self.state, 'ts': ts, 'vs': vs}
+
+    def run(self, delay=0, dur=100, amp=10, dt=0.025, tstop=30, v_init=-70,
+            warm=None):
+        """
+        Simulate a current clamp measurement on all cells, with the same
+        arguments as run_IClamp. amp may be an array of K amplitudes.
+
+        warm - a state from warm_start, with the same dt and v_init, to
+            start from instead of t=0. The result is the same as without it,
+            as long as the clamp and the synapses start after warm['until'].
+
+        Returns (t, v): t the array of time points, v a (K, len(t)) array of
+        membrane voltages. As in run_IClamp, t=0 is not included. The final
+        state (t, v, m, h, n) is kept in self.state.
+        """
+        if warm is not None:
+            _check_warm(warm, dt, v_init, tstop,
+                    [delay] if np.any(amp) else [],
+                    [onset for gmax, onset, tau, e in self.synapses
+                        if np.any(gmax)])
+        K = self.K
+        p = self._param
+        area = np.pi * p('L') * p('diam')   # um2, lateral surface
+        mfact = 1e2 / area                  # nA -> mA/cm2
+        cfac = 1e-3 * p('cm') / dt
+        gl, el = p('g_pas'), p('e_pas')
+        gna, gk, vtraub = p('gnabar_hh2'), p('gkbar_hh2'), p('vtraub_hh2')
+        ena, ek = p('ena'), p('ek')
+        gx, ekkx = p('gkbar_ix'), p('ekk_ix')
+        gxx, ekkxx = p('gkbar_ixx'), p('ekk_ixx')
+        tadj = 3.0 ** ((p('celsius') - 36) / 10)
+        amp = np.ones(K) * amp
+        synapses = [(np.ones(K) * gmax, onset, tau, e)
+                for gmax, onset, tau, e in self.synapses]
+
+        def current(v, t, m, h, n):
+            """ Total membrane current in mA/cm2 """
+            i = gl * (v - el)
+            i += gna * m*m*m*h * (v - ena) + gk * n*n*n*n * (v - ek)
+            i += gx * (v - ekkx)**2 + gxx * (v - ekkxx)**2
+            for gmax, onset, tau, e in synapses:
+                i += mfact * gmax * alpha((t - onset) / tau) * (v - e)
+            return i
+
+        v = np.ones(K) * v_init
+        m = np.zeros(K)
+        h = np.zeros(K)
+        n = np.zeros(K)
+        t = 0.
+        if warm is not None:
+            t, v, m, h, n = warm['state']
+
+        nmax = int(np.ceil(tstop / dt)) + 2
+        ts = np.empty(nmax)
+        vs = np.empty((K, nmax))
+
+        step = 0
+        while t < tstop:
+            # Currents at the midpoint of the step
+            t += .5 * dt
+            i = current(v, t, m, h, n)
+            g = (current(v + DV, t, m, h, n) - i) / DV
+            if delay <= t < delay + dur:
+                i = i - mfact * amp
+
+            # Backward Euler step for v, then gating with the new v
+            v = v - i / (cfac + g)
+            t += .5 * dt
+            m_inf, h_inf, n_inf, tau_m, tau_h, tau_n = hh2_rates(v, vtraub,
+                    tadj)
+            m = m + (1 - Exp(-dt/tau_m)) * (m_inf - m)
+            h = h + (1 - Exp(-dt/tau_h)) * (h_inf - h)
+            n = n + (1 - Exp(-dt/tau_n)) * (n_inf - n)
+
+            if step == nmax:
+                ts = np.concatenate((ts, np.empty(nmax)))
+                vs = np.concatenate((vs, np.empty((K, nmax))), axis=1)
+            ts[step] = t
+            vs[:, step] = v
+            step += 1
+
+        self.state = (t, v, m, h, n)
+        if warm is not None:
+            return (np.concatenate((warm['ts'], ts[:step])),
+                    np.concatenate((warm['vs'], vs[:, :step]), axis=1))
+        return ts[:step], vs[:, :step]
+
+def _check_warm(warm, dt, v_init, tstop, delays, onsets):
+    """ Raises ValueError if a run with these settings, clamps starting at
+    *delays* and synapses at *onsets* cannot start from *warm* """
+    if (warm['dt'], warm['v_init']) != (dt, v_init):
+        raise ValueError("warm start taken with dt=%g, v_init=%g"
+                % (warm['dt'], warm['v_init']))
+    if tstop < warm['until'] or min(list(delays) + list(onsets) +
+            [np.inf]) < warm['until']:
+        raise ValueError("warm start at %g ms: the run must not start "
+                "anything before" % warm['until'])
+
+def run_IClamp(sec, pos=0.5, delay=0, dur=100, amp=10, dt=0.025, tstop=30,
+        v_init=-70, var='v', rec_pos=0.5):
+    """
+    Drop-in replacement for toolset.run_IClamp on single-compartment
+    sections, integrated with NumPy. Returns an array of (time, voltage)
+    pairs.
+
+    If *amp* is a sequence of K amplitudes, the K runs are done at once and a
+    list of K (time, voltage) arrays is returned.
+
+    Only the membrane voltage can be recorded, pos and rec_pos are ignored
+    (there is only one compartment).
+    """
+    if var != 'v':
+        raise ValueError("hhbatch can only record 'v', not '%s'" % var)
+
+    K = np.size(amp)
+    batch = SomaBatch.from_section(sec, K)
+    t, v = batch.run(delay=delay, dur=dur, amp=amp, dt=dt, tstop=tstop,
+            v_init=v_init)
+
+    data = [np.transpose([t, vk]) for vk in v]
+    if np.ndim(amp) == 0:
+        return data[0]
+    return data
@@ -12,110 +12,152 @@
 #
 #################################################
 
+import os
 import sys
 from toolset import *
-
-h.celsius = 36
-
-# 1.1 - Define the three different neuron models:
-HH = DefaultSection("HH")
-HHx = DefaultSection("HHx")
-HHx.insert("ix")
-HHxx = DefaultSection("HHxx")
-HHxx.insert("ixx")
+import hhbatch
+import threshold
+from cache import RunCache
+from tracestore import TraceStore
+from simulation import WarmStart
+from cellbatch import CellBatch
+import fitting
+
+# 1.1 - The three different neuron models are defined in toolset.models, and
+# built the first time a problem uses them
+def part1_models():
+    """ Returns the (HH, HHx, HHxx) somas, at 36 degrees """
+    return models.get('HH'), models.get('HHx'), models.get('HHxx')
+
+# Traces of previous runs are reused when the model has not changed
+cache = RunCache()
 
 # data = run_IClamp(sec=HH, delay=15, dur=150, amp=.30, tstop=150, dt=0.01)
 # ax = U_vs_t(data)
 # plt.show()
 
-# 1 - Run Skander's example stimulations, for comparison
-def skander_examples():
-    data = run_IClamp(HH, delay=50, dur=500, amp=0.5, tstop=600)
-    ax = U_vs_t(data)
-    ax.set_xlim(0, 600)
-    ax.set_ylim(-80, 60)
-    ax.set_title("HH, I=0.5 nA")
-    figsave("1-HH_skander-example.pdf")
+def new_store(name, folder="../data/traces/"):
+    """ Returns an empty trace store *name* in *folder* """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    path = os.path.join(folder, name)
+    for suffix in ('', '.idx', '.json'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return TraceStore(path)
 
-    plt.clf()
-    data = run_IClamp(HHx, delay=50, dur=500, amp=4.6, tstop=600)
-    ax = U_vs_t(data)
-    ax.set_xlim(0, 600)
-    ax.set_ylim(-80, 60)
-    ax.set_title("HHx, I = 4.6 nA")
-    figsave("1-HHx_skander-example.pdf")
-
-    plt.clf()
-    data = run_IClamp(HHxx, delay=50, dur=500, amp=0.26, tstop=600)
+# 1 - Run Skander's example stimulations, for comparison
+def skander_example(data, title):
+    """ Draws one of the example traces """
     ax = U_vs_t(data)
     ax.set_xlim(0, 600)
     ax.set_ylim(-80, 60)
-    ax.set_title("HHxx, I=0.26 nA")
-    figsave("1-HHxx_skander-example.pdf")
+    ax.set_title(title)
+
+def skander_examples(processes=None):
+    HH, HHx, HHxx = part1_models()
+    jobs = []
+    for model, amp, title in ((HH, 0.5, "HH, I=0.5 nA"),
+            (HHx, 4.6, "HHx, I = 4.6 nA"), (HHxx, 0.26, "HHxx, I=0.26 nA")):
+        data = cache.run_IClamp(model, delay=50, dur=500, amp=amp, tstop=600)
+        jobs.append((skander_example, (data, title),
+            "1-%s_skander-example.pdf" % model.name))
+    # the three figures are drawn side by side
+    render(jobs, processes=processes)
 
 # 1.2 - Type I or II?
-def prob1_2():
+def prob1_2(chunk=10):
+    HH, HHx, HHxx = part1_models()
     fig = plt.figure(figsize=[5.3, 3])
     fig.subplots_adjust(left=0.15, bottom=0.15)
     col = colours(4)
 
-    for model in (HH, HHxx):
-        data = []
-        for I in np.arange(0, 1, 0.025):
-            clampdata = run_IClamp(sec=model, delay=0, dur=100, amp=I, 
-                    tstop=100)
-            data.append([I, clampdata])
-        ax = f_vs_I(data, '.', label=model.name, v_th=0, color=col.pop(0))
-
-    # HHx requires more current
-    data = []
-    for I in np.arange(4, 5, 0.02):
-        clampdata = run_IClamp(sec=HHx, delay=0, dur=100, amp=I, 
-                tstop=100)
-        data.append([I, clampdata])
-    ax = f_vs_I(data, '.', label=HHx.name, v_th=0, color=col.pop(0))
+    # The currents of a curve are integrated by hhbatch, *chunk* at a time.
+    # Each chunk of traces goes to a trace store before the next is run, so
+    # only chunk traces are ever in memory, and f_vs_I reads them back one
+    # at a time. HHx requires more current.
+    for model, I in ((HH, np.arange(0, 1, 0.025)),
+            (HHxx, np.arange(0, 1, 0.025)), (HHx, np.arange(4, 5, 0.02))):
+        store = new_store("1_2-%s" % model.name)
+        for start in range(0, len(I), chunk):
+            amps = I[start:start + chunk]
+            for amp, d in zip(amps, hhbatch.run_IClamp(sec=model, delay=0,
+                    dur=100, amp=amps, tstop=100)):
+                store.append(d, key=amp)
+        ax = f_vs_I(store.items(), '.', label=model.name, v_th=0,
+                color=col.pop(0))
 
     ax.legend(loc="upper right")
     figsave("1_2-neuron_type.pdf")
 
 # 1.3 - How many synapses need to be open for a spike?
-def prob1_3():
-    prob1_3_run(HH, [1, 2, 3, 4, 5, 10, 40])
-    prob1_3_run(HHx, [1, 10, 20, 23, 24, 25, 30, 40])
-    prob1_3_run(HHxx, [1, 2, 3, 4, 10, 40])
-
-def prob1_3_run(model, Ns):
-    ax = newplot("Time [ms]", "Membrane voltage [mV]", 
-            "Response to synaptic current")
-    col = colours(len(Ns))
+def prob1_3(processes=None):
+    HH, HHx, HHxx = part1_models()
+    # all runs first, then the three figures are drawn side by side
+    jobs = []
+    for model, Ns in ((HH, [1, 2, 3, 4, 5, 10, 40]),
+            (HHx, [1, 10, 20, 23, 24, 25, 30, 40]),
+            (HHxx, [1, 2, 3, 4, 10, 40])):
+        jobs.append((draw_synapse_number, (prob1_3_traces(model, Ns), Ns),
+            "1_3-%s_synapse_number.pdf" % model.name))
+    render(jobs, processes=processes)
+
+def prob1_3_traces(model, Ns):
+    """ Traces of *model* with each number of synapses in Ns open """
+    # The synapses open at 10 ms, the first 10 ms are simulated only once
+    model.reset_synapses()
+    warm = WarmStart(model, 10, dt=0.01)
+    traces = []
     for i in Ns:
         # Reset synapses, then activate just the appropriate number
         model.reset_synapses()
         model.activate_synapses(N=i, onset=10)
         # no current injection, we just want synaptic current
-        data = run_IClamp(sec=model, delay=0, dur=20, amp=0, tstop=50, dt=0.01)
+        traces.append(cache.run_IClamp(model, delay=0, dur=20, amp=0,
+            tstop=50, dt=0.01, warm=warm))
+    return traces
+
+def draw_synapse_number(traces, Ns):
+    ax = newplot("Time [ms]", "Membrane voltage [mV]", 
+            "Response to synaptic current")
+    col = colours(len(Ns))
+    for data, i in zip(traces, Ns):
         t, v = np.transpose(data)
-        ax.plot(t, v, '-', color=col.pop(0), label=str(i))
+        plot_trace(ax, t, v, '-', color=col.pop(0), label=str(i))
     ax.legend()
+
+def prob1_3_run(model, Ns):
+    draw_synapse_number(prob1_3_traces(model, Ns), Ns)
     figsave("1_3-%s_synapse_number.pdf" % model.name)
 
+def prob1_3_thresholds():
+    """ Minimum number of synapses and rheobase of each model, by bisection
+    instead of the hand-picked lists above """
+    HH, HHx, HHxx = part1_models()
+    for model in (HH, HHx, HHxx):
+        model.reset_synapses()
+        N, runs = threshold.min_synapses(model, onset=10, dur=20, tstop=50,
+                dt=0.01, warm=WarmStart(model, 10, dt=0.01))
+        print("%s: %s synapses (%d runs)" % (model.name, N, runs))
+        I, runs = threshold.rheobase(model, delay=0, dur=100, tstop=100)
+        print("%s: rheobase %.3f nA (%d runs)" % (model.name, I, runs))
+
 # 1.4 - Number of activated synapses vs EPSP in subthreshold regime
 def prob1_4():
+    HH, HHx, HHxx = part1_models()
     ax = newplot("Number of activated synapses", "Max voltage [mV]")
     col = colours(5)
     for model in (HH, HHx, HHxx):
-        # reset synapses:
-        max_v = []
-        for i in range(len(model.synapses)):
-            # activate the synapses
-            model.reset_synapses()
-            model.activate_synapses(N=i, onset=10)
-            # Run current clamp subthreshold
-            data = run_IClamp(sec=model, delay=5, dur=150, amp=.0, tstop=50,
-                    dt=0.01)
-            max_v.append([i, data[:,1].max()])
-        n, v = np.transpose(max_v)
-        ax.plot(n, v, '.', label=model.name, color=col.pop(0))
+        # one copy of the model per number of activated synapses, all
+        # simulated in a single run
+        Ns = range(len(model.synapses))
+        batch = CellBatch(model.name, len(Ns))
+        for cell, i in zip(batch.cells, Ns):
+            cell.activate_synapses(N=i, onset=10)
+        # Run current clamp subthreshold
+        t, v = batch.run(delay=5, dur=150, amp=.0, tstop=50, dt=0.01)
+        ax.plot(Ns, v.max(axis=1), '.', label=model.name, color=col.pop(0))
+        del batch
     ax.legend(loc="lower right")
     figsave("1_4-number_of_synapses.pdf")
 
@@ -123,6 +165,30 @@ def prob1_4():
     ax.set_ylim(-80, -40)
     figsave("1_4-number_of_synapses_zoom.pdf")
 
+# Fitting - the conductances of a model, found back from its behaviour
+def fit_conductances(name='HHx', names=('gkbar_hh2', 'gkbar_ix'),
+        generations=30, seed=0):
+    """ Fits the parameters *names* of model *name* to its f-I curve of
+    prob1_2 and to its spike frequency in Skander's example, searching a
+    factor of 4 either way of the actual values. Prints the fitted and the
+    actual values. """
+    model = models.get(name)
+    I, amp = {'HH': (np.arange(0, 1, 0.1), 0.5),
+            'HHx': (np.arange(4, 5, 0.1), 4.6),
+            'HHxx': (np.arange(0, 1, 0.1), 0.26)}[name]
+    f = spike_stats(hhbatch.run_IClamp(model, delay=0, dur=100, amp=I,
+        tstop=100), v_th=0)['freq']
+    example = cache.run_IClamp(model, delay=50, dur=500, amp=amp, tstop=600)
+    targets = [fitting.FICurve(I, f),
+            fitting.FICurve([amp], [spikefreq(example, v_th=0)], delay=50,
+                dur=500, tstop=600)]
+    fitter = fitting.Fitter(model, targets, list(names))
+    result = fitter.run(generations=generations, seed=seed, verbose=True)
+    for parameter in names:
+        print("%s: fitted %g, actual %g" % (parameter,
+            result['params'][parameter], fitter.params[parameter]))
+    return result
+
 if __name__ == '__main__':
     # skander_examples()
     prob1_2()
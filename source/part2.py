@@ -13,36 +13,21 @@
 #################################################
 
 import sys
-from toolset2 import *
+from toolset import *
+from simulation import StopAfterPeak, WarmStart
+from sweep import sweep, grid_points
+from cable import CableTree
+from cellbatch import CellBatch
+import threshold
+import sweepdata
 
 
-# Create HH soma, a 18 um x 18 um
-soma = DefaultSection('soma', 'hh')
+def part2_model():
+    """ Returns the (soma, dend1, dend2, dend3) tree, for the sweeps.
 
-# Attach a dendrite directly to the soma
-dend1 = DefaultDendrite("Dend. 1")
-dend1.connect(soma, 0, 1)
-dend1.insert('pas')
-dend1.reset_synapses()
-
-# Attach two dendrites to the first, forming a y, and add synapses at their
-# other extremity
-dend2 = DefaultDendrite("Dend. 2")
-dend2.connect(dend1, 0, 1)
-dend2.insert_synapses(N=100)
-dend2.insert('ix')
-dend2.gkbar_ix = 2e-5
-dend2.reset_synapses()
-
-dend3 = DefaultDendrite("Dend. 3")
-dend3.connect(dend1, 0, 1)
-dend3.insert_synapses()
-dend3.insert('ixx')
-dend3.reset_synapses()
-
-# dend4 = DefaultDendrite("dend4")
-# dend4.connect(dend1, 0, 1)
-# dend4.insert_synapses(N=1000)
+    The tree (see toolset.models) is built on the first call: in every sweep
+    worker process, or once in the parent before they are forked. """
+    return models.get('tree')
 
 # 2.1 How many synapses for a spike?
 
@@ -54,16 +39,14 @@ def prob2_1():
 def prob2_1_a(Ns):
     ax = newplot("Time [ms]", "Membrane voltage [mV]", "Synapses on Dendrite 2")
     col = colours(len(Ns))
-    dend2.reset_synapses()
-    dend3.reset_synapses()
-    for i in Ns:
-        # Reset synapses, then activate just the appropriate number
-        dend2.reset_synapses()
+    # one copy of the tree per number of synapses, all simulated at once
+    batch = CellBatch('tree', len(Ns))
+    for (soma, dend1, dend2, dend3), i in zip(batch.cells, Ns):
         dend2.activate_synapses(N=i, onset=20, gmax=0.002)
-        # no current injection
-        data = run_IClamp(sec=soma, delay=0, dur=0, amp=0, tstop=80, dt=0.01)
-        t, v = np.transpose(data)
-        ax.plot(t, v, '-', color=col.pop(0), label=str(i))
+    # no current injection
+    t, v = batch.run(sec=0, delay=0, dur=0, amp=0, tstop=80, dt=0.01)
+    for vi, i in zip(v, Ns):
+        plot_trace(ax, t, vi, '-', color=col.pop(0), label=str(i))
     ax.legend()
     ax.set_ylim(-80, 40)
     figsave("2_1-%s_synapse_number.pdf" % 'dend2')
@@ -71,17 +54,14 @@ def prob2_1_a(Ns):
 def prob2_1_b(Ns):
     ax = newplot("Time [ms]", "Membrane voltage [mV]", "Synapses on Dendrite 3")
     col = colours(len(Ns))
-    dend2.reset_synapses()
-    dend3.reset_synapses()
-    for i in Ns:
-        # Reset synapses, then activate just the appropriate number
-        dend3.reset_synapses()
+    batch = CellBatch('tree', len(Ns))
+    for (soma, dend1, dend2, dend3), i in zip(batch.cells, Ns):
         dend3.activate_synapses(N=i, onset=20)
-        # no current injection
-        data = run_IClamp(sec=soma, pos=1, delay=0, dur=0, amp=0, tstop=80, 
-                dt=0.01, v_init=-70)
-        t, v = np.transpose(data)
-        ax.plot(t, v, '-', color=col.pop(0), label=str(i))
+    # no current injection
+    t, v = batch.run(sec=0, pos=1, delay=0, dur=0, amp=0, tstop=80, dt=0.01,
+            v_init=-70)
+    for vi, i in zip(v, Ns):
+        plot_trace(ax, t, vi, '-', color=col.pop(0), label=str(i))
     ax.legend()
     ax.set_ylim(-80, 40)
     figsave("2_1-%s_synapse_number.pdf" % 'dend3')
@@ -90,21 +70,31 @@ def prob2_1_c(Ns):
     ax = newplot("Time [ms]", "Membrane voltage [mV]", 
             "Synapses on Dendrite 2 \& 3")
     col = colours(len(Ns))
-    for i in Ns:
-        # Reset synapses, then activate just the appropriate number
-        dend2.reset_synapses()
-        dend3.reset_synapses()
+    batch = CellBatch('tree', len(Ns))
+    for (soma, dend1, dend2, dend3), i in zip(batch.cells, Ns):
         dend2.activate_synapses(N=i, onset=20)
         dend3.activate_synapses(N=i, onset=20)
-        # no current injection
-        data = run_IClamp(sec=soma, delay=0, dur=20, amp=0, tstop=80, dt=0.01)
-        t, v = np.transpose(data)
-        ax.plot(t, v, '-', color=col.pop(0), label=str(i))
+    # no current injection
+    t, v = batch.run(sec=0, delay=0, dur=20, amp=0, tstop=80, dt=0.01)
+    for vi, i in zip(v, Ns):
+        plot_trace(ax, t, vi, '-', color=col.pop(0), label=str(i))
     ax.legend()
     figsave("2_1-%s_synapse_number.pdf" % 'dend2and3')
 
+def prob2_1_thresholds():
+    """ Minimum number of synapses on dend2, then dend3, for a soma spike,
+    found by bisection """
+    soma, dend1, dend2, dend3 = part2_model()
+    for dend in (dend2, dend3):
+        dend2.reset_synapses()
+        dend3.reset_synapses()
+        N, runs = threshold.min_synapses(dend, rec_sec=soma, onset=20,
+                dur=0, tstop=80, dt=0.01)
+        print("%s: %s synapses (%d runs)" % (dend.name, N, runs))
+
 def prob2_1_d():
     """ Open 40 synapses, and observe peak propagation """
+    soma, dend1, dend2, dend3 = part2_model()
     ax = newplot("Time [ms]", "Voltage [mV]", "Spike propagation along Dend. 1")
     col = colours(6)
     for x in [0, 0.5, 1]:
@@ -115,12 +105,13 @@ def prob2_1_d():
         data = run_IClamp(sec=dend1, pos=0, rec_pos=x, amp=0, dur=100, 
                 tstop=100)
         t, v = data.transpose()
-        ax.plot(t, v, label=str(x), color=col.pop(2))
+        plot_trace(ax, t, v, label=str(x), color=col.pop(2))
     ax.legend()
     figsave("2_1-spike_propagation.pdf")
 
 def prob2_1_e():
     """ Just open 100'000 synapses """
+    dend4 = models.get('dend4')
     ax = newplot("Time [ms]", "Membrane voltage [mV]", "1'000 Synapses")
     # Reset synapses, then activate just the appropriate number
     dend4.reset_synapses()
@@ -128,11 +119,12 @@ def prob2_1_e():
     # no current injection
     data = run_IClamp(sec=dend4, pos=0.5, delay=0, dur=20, amp=0, tstop=100, dt=0.01)
     t, v = np.transpose(data)
-    ax.plot(t, v, '-', color=plt.cm.jet(1/40.))
+    plot_trace(ax, t, v, '-', color=plt.cm.jet(1/40.))
     figsave("2_1-1000_synapses_measureDendrite.pdf") 
 
 def prob2_2():
     """ Observe synaptic integration """
+    soma, dend1, dend2, dend3 = part2_model()
     ax = newplot("Number of activated synapses", "Max voltage [mV]")
     col = colours(4)
     for dend in (dend2, dend3):
@@ -145,8 +137,8 @@ def prob2_2():
             dend.reset_synapses()
             dend.activate_synapses(N=i)
             # Run current clamp subthreshold
-            data = run_IClamp(sec=soma, delay=5, dur=0, amp=0, tstop=50,
-                    dt=0.01)
+            data, reason = run_IClamp(sec=soma, delay=5, dur=0, amp=0,
+                    tstop=50, dt=0.01, stop=StopAfterPeak())
             max_v.append([i, data[:,1].max()])
         n, v = np.transpose(max_v)
         ax.plot(n, v, '.', label=dend.name, color=col.pop(0))
@@ -156,8 +148,8 @@ def prob2_2():
         dend3.reset_synapses()
         dend2.activate_synapses(N=i)
         dend3.activate_synapses(N=i)
-        data = run_IClamp(sec=soma, delay=5, dur=0, amp=0, tstop=50,
-                dt=0.01)
+        data, reason = run_IClamp(sec=soma, delay=5, dur=0, amp=0, tstop=50,
+                dt=0.01, stop=StopAfterPeak())
         max_v.append([i, data[:,1].max()])
     n, v = np.transpose(max_v)
     ax.plot(n, v, '.', label="Dend. 2 \& 3", color=col.pop(0))
@@ -165,24 +157,82 @@ def prob2_2():
     ax.legend(loc="lower right")
     figsave("2_2-Synaptic_summation.pdf")
 
-def prob2_2_b():
-    """ 2D search, for number of neurons activated on each dendrite """
-    max_v = [] # store maximum voltage of each run
-    for i in range(0, 60):
-        for j in range(0, 30):
-            print i, j
-            dend2.reset_synapses()
-            dend3.reset_synapses()
+def summation_point(tree, i, j):
+    """ Max soma voltage with i synapses active on dend2 and j on dend3 """
+    soma, dend1, dend2, dend3 = tree
+    dend2.reset_synapses()
+    dend3.reset_synapses()
+    dend2.activate_synapses(N=i, onset=0)
+    dend3.activate_synapses(N=j, onset=0)
+    # only the peak matters: stop once it is over
+    data, reason = run_IClamp(sec=soma, delay=0, dur=0, amp=0, tstop=25,
+            dt=0.01, stop=StopAfterPeak())
+    return data[:,1].max()
+
+def prob2_2_b(processes=None, mpi=False):
+    """ 2D search, for number of neurons activated on each dendrite. With
+    mpi=True, the grid is spread over MPI ranks (see sweep.py). """
+    # store maximum voltage of each run, as [i, j, max_v] rows
+    max_v = sweep(part2_model, summation_point, [range(0, 60), range(0, 30)],
+            processes=processes, verbose=True,
+            checkpoint='../data/synaptic_summation.part', mpi=mpi)
+    save_summation(max_v)
+
+def prob2_2_b_cable(batch=900):
+    """ Same grid as prob2_2_b, integrated by the NumPy cable solver, *batch*
+    grid points per solve """
+    soma, dend1, dend2, dend3 = part2_model()
+    dend2.reset_synapses()
+    dend3.reset_synapses()
+    points = np.array(grid_points([range(0, 60), range(0, 30)]))
+    max_v = []
+    for k in range(0, len(points), batch):
+        i, j = points[k:k+batch].transpose()
+        tree = CableTree([soma, dend1, dend2, dend3], K=len(i))
+        # activate_synapses(N=i) on identical synapses, gmax=0.002 each
+        tree.add_synapses(dend2, 0.5, gmax=0.002*i, onset=0)
+        tree.add_synapses(dend3, 0.5, gmax=0.002*j, onset=0)
+        t, v = tree.run(dt=0.01, tstop=25, record=(soma, 0.5))
+        max_v.extend(np.transpose([i, j, v.max(axis=1)]))
+    save_summation(max_v, solver='cable')
+
+def prob2_2_b_batched(batch=100, threads=None):
+    """ Same grid as prob2_2_b, *batch* grid points per NEURON run, each on
+    its own copy of the tree (see cellbatch.py). The runs go to tstop, as
+    with the cable solver. The trees of a run are spread over *threads*
+    threads, one per core by default. """
+    points = grid_points([range(0, 60), range(0, 30)])
+    max_v = []
+    for k in range(0, len(points), batch):
+        trees = CellBatch('tree', len(points[k:k+batch]))
+        for (soma, dend1, dend2, dend3), (i, j) in zip(trees.cells,
+                points[k:k+batch]):
             dend2.activate_synapses(N=i, onset=0)
             dend3.activate_synapses(N=j, onset=0)
-            data = run_IClamp(sec=soma, delay=0, dur=0, amp=0, tstop=25,
-                    dt=0.01)
-            max_v.append([i, j, data[:,1].max()])
+        t, v = trees.run(sec=0, delay=0, dur=0, amp=0, tstop=25, dt=0.01,
+                threads=threads)
+        max_v.extend([list(point) + [vk.max()]
+            for point, vk in zip(points[k:k+batch], v)])
+        del trees
+    save_summation(max_v, solver='cellbatch')
+
+def save_summation(max_v, solver='neuron'):
+    """ Saves the [i, j, max_v] rows of the summation sweep, as text (.dat)
+    and in the binary format of sweepdata (.sweep) """
     np.savetxt('../data/synaptic_summation.dat', max_v)
+    sweepdata.save('../data/synaptic_summation.sweep', max_v,
+            ['Dend2', 'Dend3', 'Potential'],
+            axes=[range(0, 60), range(0, 30)],
+            metadata={'model': 'part2_model', 'solver': solver,
+                'recorded': 'max v at soma(0.5), mV',
+                'stimulus': 'Dend2 and Dend3 synapses activated at t=0, '
+                    'gmax 0.002 uS each, no current clamp',
+                'dt': 0.01, 'tstop': 25})
 
 # 2.3 - Inhibitory synapse
 def prob2_3_a():
     """ Open inhibitory synapse, to observe its dynamics """
+    soma, dend1, dend2, dend3 = part2_model()
     ax = newplot("Time [ms]", "Voltage [mV]", "Inhibitory spike")
     dend1.insert_inhibitory_synapse()
     dend2.reset_synapses()
@@ -191,10 +241,38 @@ def prob2_3_a():
     dend1.activate_inhibitory_synapse(gmax=-0.05)
     data = run_IClamp(sec=dend1, rec_pos=0.5, amp=0, dur=0, tstop=100)
     t, v = data.transpose()
-    ax.plot(t, v, '-')
+    plot_trace(ax, t, v, '-')
     figsave("2_3-inhibitory_spike_alone.pdf")
 
-def prob2_3_b():
+def veto_point(tree, dt, gmax):
+    """ Max soma voltage when the inhibitory synapse opens dt ms after 27
+    synapses on dend3. The warm starts are kept in soma.warm, one per
+    onset: empty it when the tree changes (prob2_3_b does before its
+    sweep). """
+    soma, dend1, dend2, dend3 = tree
+    if not hasattr(dend1, 'inhib_synapse'):
+        dend1.insert_inhibitory_synapse()
+    # reset everything
+    dend1.reset_inhibitory_synapse()
+    dend2.reset_synapses()
+    dend3.reset_synapses()
+    # nothing happens before the first synapse opens: start from the state
+    # at that time, simulated once per onset
+    onset = min(10, 10+dt)
+    if not hasattr(soma, 'warm'):
+        soma.warm = {}
+    if onset not in soma.warm:
+        soma.warm[onset] = WarmStart(soma, onset)
+    # activate 1.5 * N_max synapses on dend3
+    dend3.activate_synapses(onset=10, N=27)
+    dend1.activate_inhibitory_synapse(gmax=gmax, onset=10+dt)
+    data = run_IClamp(sec=soma, pos=0.5, rec_pos=0.5, amp=0, dur=0,
+            tstop=30, warm=soma.warm[onset])
+    # t, v = data.transpose()
+    # ax.plot(t, v, '-', color=col.pop(0), label=str(gmax))
+    return data[:,1].max()
+
+def prob2_3_b(processes=None, mpi=False):
     """ Thwart spike with inhibitory synapse 
     
     We know from the previous experiment (prob2_3_a) that the spike takes about
@@ -202,7 +280,9 @@ def prob2_3_b():
     the expected peak of the EPSP (about 15 ms after synaptic opening). 
     
     On second note, this doesn't work, so we'll just do a big search on dt and
-    gmax """
+    gmax. With mpi=True, the search is spread over MPI ranks (see sweep.py).
+    """
+    soma, dend1, dend2, dend3 = part2_model()
 
     dt = 10
     onset = 10
@@ -211,33 +291,34 @@ def prob2_3_b():
             # "Veto spike %d ms after synaptic onset" % dt)
     # Setup inhibitory synapse
     dend1.insert_inhibitory_synapse()
+    # warm starts taken before the tree was last changed are not valid:
+    # the sweep (and the workers forked for it) starts without any
+    soma.warm = {}
 
     # try a few values of gmax, see what works best.
     # col = colours(6)
-    max_v = []
-    for dt in range(-2, 15):
-        for gmax in np.arange(-0.01, -0.10, -0.01):
-            # reset everything
-            dend1.reset_inhibitory_synapse()
-            dend2.reset_synapses()
-            dend3.reset_synapses()
-            # activate 1.5 * N_max synapses on dend3  
-            dend3.activate_synapses(onset=10, N=27)
-            dend1.activate_inhibitory_synapse(gmax=gmax, onset=10+dt)
-            data = run_IClamp(sec=soma, pos=0.5, rec_pos=0.5, amp=0, dur=0, 
-                    tstop=30)
-            # t, v = data.transpose()
-            # ax.plot(t, v, '-', color=col.pop(0), label=str(gmax))
-            max_v.append([dt, gmax, data[:,1].max()])
-            print max_v[-1]
+    max_v = sweep(part2_model, veto_point,
+            [range(-2, 15), np.arange(-0.01, -0.10, -0.01)],
+            processes=processes, verbose=True,
+            checkpoint='../data/inhibitory_synapse.part', mpi=mpi)
     # ax.legend()
     # figsave("2_3-veto_spike.pdf")
     np.savetxt("../data/inhibitory_synapse.dat", max_v)
+    sweepdata.save("../data/inhibitory_synapse.sweep", max_v,
+            ['Delay', 'Gmax', 'Potential'],
+            axes=[range(-2, 15), np.arange(-0.01, -0.10, -0.01)],
+            metadata={'model': 'part2_model', 'solver': 'neuron',
+                'recorded': 'max v at soma(0.5), mV',
+                'stimulus': '27 Dend3 synapses activated at t=10 ms, '
+                    'inhibitory synapse on dend1 (gmax Gmax uS) at '
+                    't=10+Delay ms',
+                'dt': 0.025, 'tstop': 30})
 
 def prob2_3_c():
     """ Thwart spike with inhibitory synapse 
     
     This func just plot the timeseries again. """
+    soma, dend1, dend2, dend3 = part2_model()
 
     ax = newplot("Time [ms]", "Voltage [mV]", 
             "Inhibitory spike, vary $g_{max}$")
@@ -250,6 +331,9 @@ def prob2_3_c():
             # "Veto spike %d ms after synaptic onset" % dt)
     # Setup inhibitory synapse
     dend1.insert_inhibitory_synapse()
+    # warm starts taken before the tree was last changed are not valid:
+    # the sweep (and the workers forked for it) starts without any
+    soma.warm = {}
 
     # try a few values of gmax, see what works best.
     # col = colours(6)
@@ -264,11 +348,16 @@ def prob2_3_c():
         data = run_IClamp(sec=soma, pos=0.5, rec_pos=0.5, amp=0, dur=0, 
                 tstop=50)
         t, v = data.transpose()
-        ax.plot(t, v, '-', color=col.pop(0), label=str(gmax))
+        plot_trace(ax, t, v, '-', color=col.pop(0), label=str(gmax))
     ax.legend()
     figsave("2_3-veto_spike.pdf")
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # one problem, e.g. mpiexec -n 4 python part2.py prob2_2_b --mpi
+        options = {'mpi': True} if '--mpi' in sys.argv[2:] else {}
+        globals()[sys.argv[1]](**options)
+        sys.exit()
     # prob2_1_b()
     # prob2_1_a([0, 47, 50, 51, 53, 55])
     prob2_1_b([0, 15, 17, 18, 19, 20])
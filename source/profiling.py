@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Timing of the phases of a simulation: model setup, finitialize, the
+#   fadvance loop, copying the recordings, spike analysis and plotting. Off
+#   by default. Turned on for a block of code with
+#
+#       with profiling.profile() as prof:
+#           ...
+#       print(prof.summary())
+#       prof.save_chrome_trace('trace.json')
+#
+#   or for a whole script with the environment variable NEURON_PROFILE: the
+#   summary is printed at exit, and if the value ends in .json, the trace is
+#   saved in that file (open it in chrome://tracing or Perfetto).
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import resource
+import threading
+
+# The profile being recorded, None when profiling is off
+_current = None
+
+class _NoSpan(object):
+    """ What span() returns when profiling is off """
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_no_span = _NoSpan()
+
+class _Span(object):
+
+    def __init__(self, profile, name, args):
+        self.profile = profile
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.events.append((self.name, self.start,
+            time.perf_counter() - self.start, threading.current_thread().ident,
+            self.args))
+        return False
+
+def span(name, **args):
+    """ Context manager timing the phase *name* (with optional details in
+    args), if profiling is on """
+    if _current is None:
+        return _no_span
+    return _Span(_current, name, args)
+
+def timed(name):
+    """ Decorator putting every call of a function in a span *name* """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1):
+    """ Adds *value* to counter *name*, if profiling is on """
+    if _current is not None:
+        _current.counters[name] = _current.counters.get(name, 0) + value
+
+def peak_rss():
+    """ Peak resident memory of the process, in MB """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on Mac OS
+    return rss / 1e6 if sys.platform == 'darwin' else rss / 1e3
+
+class Profile(object):
+
+    """
+    Spans and counters recorded while profiling is on. events holds
+    (name, start, duration, thread, args) tuples, times in seconds.
+    Counters filled by the simulation: 'steps' (time steps) and 'sim_ms'
+    (simulated time).
+    """
+
+    def __init__(self):
+        self.events = []
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.stop = None
+
+    def __enter__(self):
+        global _current
+        self.previous = _current
+        _current = self
+        return self
+
+    def __exit__(self, *exc):
+        global _current
+        _current = self.previous
+        self.stop = time.perf_counter()
+        self.counters['peak_rss_mb'] = peak_rss()
+        return False
+
+    def totals(self):
+        """ {name: (calls, total seconds)} of the spans """
+        totals = {}
+        for name, start, duration, thread, args in self.events:
+            calls, total = totals.get(name, (0, 0.))
+            totals[name] = (calls + 1, total + duration)
+        return totals
+
+    def summary(self):
+        """ Table of the time spent in each phase, and the counters """
+        wall = (self.stop or time.perf_counter()) - self.start
+        totals = self.totals()
+        lines = ['%-16s %8s %10s %10s %7s' % ('phase', 'calls', 'total [s]',
+            'mean [ms]', '% wall')]
+        for name, (calls, total) in sorted(totals.items(),
+                key=lambda item: -item[1][1]):
+            lines.append('%-16s %8d %10.4f %10.4f %6.1f%%' % (name, calls,
+                total, 1e3 * total / calls, 100 * total / wall))
+        lines.append('%-16s %8s %10.4f' % ('wall', '', wall))
+        counters = dict(self.counters)
+        if 'sim_ms' in counters and 'fadvance' in totals:
+            counters['sim_ms_per_s'] = counters['sim_ms'] / \
+                    totals['fadvance'][1]
+        if 'steps' in counters and 'fadvance' in totals:
+            counters['steps_per_s'] = counters['steps'] / totals['fadvance'][1]
+        for name in sorted(counters):
+            lines.append('%-16s %20.6g' % (name, counters[name]))
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """ The spans and counters in the Chrome trace event format """
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': thread,
+            'ts': 1e6 * (start - self.start), 'dur': 1e6 * duration,
+            'args': args}
+            for name, start, duration, thread, args in self.events]
+        stop = (self.stop or time.perf_counter()) - self.start
+        events.extend({'name': name, 'ph': 'C', 'pid': pid, 'ts': 1e6 * stop,
+            'args': {name: value}} for name, value in self.counters.items())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+def profile():
+    """ Context manager recording a Profile of the code it encloses """
+    return Profile()
+
+def _profile_at_exit(prof, path):
+    prof.__exit__(None, None, None)
+    sys.stderr.write(prof.summary() + '\n')
+    if path.endswith('.json'):
+        prof.save_chrome_trace(path)
+
+if os.environ.get('NEURON_PROFILE'):
+    _whole_run = Profile().__enter__()
+    atexit.register(_profile_at_exit, _whole_run, os.environ['NEURON_PROFILE'])
@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   This file contains the simulation control used by the toolset package
+#   (current clamp runs). It has no model definitions, so the solvers can
+#   import it without building or importing any model.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import neuron
+
+import numpy as np
+
+import profiling
+
+h = neuron.h
+
+################################
+# Stopping conditions
+################################
+
+# A stopping condition is called as stop(t, v, start) on the samples recorded
+# so far (t=0 included), start being the first sample that is new since the
+# previous call. It returns the index of the sample at which the run should
+# have stopped, or None to go on. Its 'reason' is reported by run_IClamp.
+
+class StopOnSpike(object):
+
+    """ Stops at the first upward crossing of v_th (as spiketimes counts a
+    spike). """
+
+    reason = 'spike'
+
+    def __init__(self, v_th=0):
+        self.v_th = v_th
+
+    def __call__(self, t, v, start):
+        above = v[max(start - 1, 0):] > self.v_th
+        idx = np.nonzero(~above[:-1] & above[1:])[0]
+        if len(idx):
+            return max(start - 1, 0) + idx[0] + 1
+
+class StopAfterPeak(object):
+
+    """ Stops once v has risen by at least min_rise mV above its first value
+    and decayed back by *fraction* of that rise, i.e. once the peak is over.
+    """
+
+    reason = 'peak'
+
+    def __init__(self, fraction=0.5, min_rise=1.0):
+        self.fraction = fraction
+        self.min_rise = min_rise
+
+    def __call__(self, t, v, start):
+        peak = np.argmax(v)
+        rise = v[peak] - v[0]
+        if rise < self.min_rise:
+            return None
+        idx = np.nonzero(v[peak:] <= v[peak] - self.fraction*rise)[0]
+        if len(idx):
+            return peak + idx[0]
+
+class StopAtSteadyState(object):
+
+    """ Stops when |dv/dt| stayed below tol (mV/ms) over the last *window* ms,
+    not before t = after (set it past the stimulus onset, the model is also
+    steady before the stimulus). """
+
+    reason = 'steady'
+
+    def __init__(self, tol=1e-3, window=5, after=0):
+        self.tol = tol
+        self.window = window
+        self.after = after
+
+    def __call__(self, t, v, start):
+        if t[-1] < self.after + self.window:
+            return None
+        first = np.searchsorted(t, max(t[-1] - self.window, self.after))
+        slope = np.abs(np.diff(v[first:]) / np.diff(t[first:]))
+        if len(slope) and slope.max() < self.tol:
+            return len(t) - 1
+
+################################
+# Warm start
+################################
+
+class WarmStart(object):
+
+    """
+    State of the model just before t = *until* (after the last step ending
+    less than dt/2 past it) in a run without any stimulus, saved once with
+    NEURON's SaveState. Passed to run_IClamp as warm=..., the run starts from
+    this state instead of integrating from t=0, and the saved samples are
+    put in front of the new ones. As long as no synapse opens
+    and no current is injected before *until*, the result is the same as
+    with a run from t=0, so a sweep only simulates its pre-onset period
+    once.
+
+    Take it after the model is complete (sections, mechanisms, synapses) and
+    with all synapses reset, and make a new one if the model changes. The
+    other arguments must be those of the runs it is used in.
+    """
+
+    def __init__(self, sec, until, dt=0.025, v_init=-70, var='v',
+            rec_pos=0.5):
+        self.sec = h.secname(sec=sec)
+        self.until = until
+        self.settings = (dt, v_init, var, rec_pos)
+
+        # Same set of point processes as in run_IClamp
+        stim = h.IClamp(0.5, sec=sec)
+        stim.amp = 0
+        t_rec = h.Vector()
+        v_rec = h.Vector()
+        t_rec.record(h._ref_t)
+        v_rec.record(getattr(sec(rec_pos), '_ref_' + var))
+        h.dt = dt
+        h.finitialize(v_init)
+        h.fcurrent()
+        epsilon = h.float_epsilon
+        h.float_epsilon = 0
+        # Only steps whose midpoint, where currents are evaluated, is before
+        # until: the last one ends within dt/2 of it.
+        try:
+            h('while (t < %.17g) { fadvance() }' % (until - .5*dt))
+        finally:
+            h.float_epsilon = epsilon
+        self.state = h.SaveState()
+        self.state.save()
+        self.t = np.array(t_rec)
+        self.v = np.array(v_rec)
+
+    def check(self, sec, delay, amp, dt, tstop, v_init, var, rec_pos):
+        """ Raises ValueError if the run does not match the saved state """
+        if h.secname(sec=sec) != self.sec or \
+                (dt, v_init, var, rec_pos) != self.settings:
+            raise ValueError("WarmStart: taken on %s with (dt, v_init, var, "
+                    "rec_pos) = %s" % (self.sec, self.settings))
+        if amp != 0 and delay < self.until:
+            raise ValueError("WarmStart: current injected at %g ms, before "
+                    "the saved state (%g ms)" % (delay, self.until))
+        if tstop < self.until:
+            raise ValueError("WarmStart: tstop %g ms is before the saved "
+                    "state (%g ms)" % (tstop, self.until))
+
+    def restore(self, t_rec, v_rec):
+        """ Restores the state, after finitialize, and the samples up to it
+        """
+        self.state.restore()
+        t_rec.from_python(self.t)
+        v_rec.from_python(self.v)
+
+################################
+# Testing and simulation control
+################################
+
+def run_IClamp(sec, pos=0.5, delay=0, dur=100, amp=10, dt=0.025, tstop=30,
+        v_init=-70, var='v', rec_pos=0.5, stop=None, check_every=1.0,
+        reducers=None, warm=None, cvode=False, atol=1e-3, rtol=0,
+        interpolate=True, record_every=None, window=None):
+    """
+    Simulate a current clamp measurement on section *sec*, stimulated by step
+    current. Returns an array of (time, voltage) pairs.
+
+    Time and *var* are recorded by NEURON itself (Vector.record) and the
+    integration loop runs in hoc, so there is no per-step Python work. As
+    before, the point at t=0 is not part of the output: the first row is the
+    state after the first step.
+
+    INPUT:
+
+    Arguments for IClamp:
+    sec - section (HH, HHx, ...)
+    pos - position of electrode along section (typically 0.5)
+    delay - delay before step in ms
+    dur - duration of step in ms
+    amp - amplitude of current in nA
+    rec_pos - position to record voltage at
+
+    Arguments for simulation:
+    dt - timestep in ms
+    tstop - endtime in ms!
+    v_init - initial membrane potential in mV
+    var - the variable to log
+
+    Early termination:
+    stop - a stopping condition (StopOnSpike, StopAfterPeak,
+        StopAtSteadyState) or a list of them, checked on *var*. When given,
+        the run ends as soon as one of them is met, the trace is cut at the
+        sample where it was met, and (data, reason) is returned. reason is
+        the condition's reason, or 'tstop' if none was met.
+    check_every - how often, in ms of simulated time, the conditions are
+        checked. The run itself proceeds in hoc between checks.
+
+    Streaming statistics:
+    reducers - a dictionary of reducers (Max, SpikeTimes, ISIStats, ... in
+        analysis.py), updated with every check_every ms of *var* as the run
+        advances. The trace is dropped after each update, so memory does not
+        grow with tstop. A dictionary with the result of each reducer is
+        returned instead of the trace. Cannot be combined with stop.
+
+    Warm start:
+    warm - a WarmStart taken on this model with the same sec, dt, v_init,
+        var and rec_pos. The run resumes from its saved state, which gives
+        the same result as running from t=0 when the clamp and the synapses
+        start after warm.until.
+
+    Adaptive time step:
+    cvode - integrate with NEURON's variable step method (CVode) instead of
+        the fixed dt. Steps are long where little happens (rest, the end of
+        an EPSP) and short during spikes. Not available with stop, reducers
+        or warm, nor while a section of the process has hh2 or hh2f (see
+        NO_CVODE), which have no derivative form.
+    atol, rtol - absolute and relative tolerances of CVode
+    interpolate - interpolate the CVode samples linearly onto the times of
+        the fixed step run, so the output has the same shape and times.
+        Otherwise the samples at the steps CVode took are returned, and
+        record_every cannot be used.
+
+    Recording:
+    record_every - keep one sample every record_every ms, a multiple of dt,
+        instead of every step. NEURON only records those (Vector.record with
+        an interval), so memory and copying shrink by the same factor. The
+        samples are those of the full run at record_every, 2*record_every,
+        ... ms; their times are the exact multiples. Not available with
+        warm. stop and reducers see the strided samples.
+    window - (t0, t1): keep only the samples from t0 to t1 ms (both
+        included). Before t0 the recordings are emptied every check_every ms
+        without being copied, and the run ends at t1 if it is before tstop.
+        Not available with stop or reducers. For the samples around spikes
+        only, see the EventWindows reducer in analysis.py.
+
+    Compared with fixed steps at dt=0.001:
+    - hh soma, 6.3 degC, 2 nA for 500 ms (40 spikes): dt=0.025 takes 0.09 s
+      and its spike times drift up to 2.2 ms late by the last spike. CVode
+      takes 0.06 s (5351 steps) and is within 0.11 ms with atol=1e-3; 0.05
+      s and 0.54 ms with 1e-2; 0.09 s and 0.09 ms with 1e-4.
+    - part2 tree, synapses on dend2, max soma voltage over 25 ms: dt=0.01
+      takes 40-60 ms and is off by 0.002 mV (5 synapses) to 0.25 mV (60,
+      spiking). CVode takes 4-10 ms and is off by 0.0003 to 0.13 mV.
+
+    """
+    if cvode and (stop is not None or reducers is not None or
+            warm is not None):
+        raise ValueError("run_IClamp: cvode cannot be used with stop, "
+                "reducers or warm")
+    if cvode:
+        _check_cvode()
+    if warm is not None:
+        warm.check(sec, delay, amp, dt, tstop, v_init, var, rec_pos)
+    stride = _stride(record_every, dt)
+    if stride > 1 and warm is not None:
+        raise ValueError("run_IClamp: record_every cannot be used with warm")
+    if stride > 1 and cvode and not interpolate:
+        raise ValueError("run_IClamp: record_every needs interpolate with "
+                "cvode")
+    if window is not None and (stop is not None or reducers is not None):
+        raise ValueError("run_IClamp: window cannot be used with stop or "
+                "reducers")
+
+    if stop is not None and reducers is not None:
+        raise ValueError("run_IClamp: use either stop or reducers")
+
+    # Define stimulate HH in the middle.
+    stim = h.IClamp(pos, sec=sec)
+    stim.delay = delay
+    stim.dur =  dur
+    stim.amp = amp
+
+    # Record on the simulator side. The vectors are resized by NEURON as the
+    # run advances, and filled in at every step (including t=0), or every
+    # stride steps.
+    t_rec = h.Vector()
+    v_rec = h.Vector()
+    ref = getattr(sec(rec_pos), '_ref_' + var)
+    if stride > 1 and not cvode:
+        t_rec.record(h._ref_t, stride * dt)
+        v_rec.record(ref, stride * dt)
+    else:
+        t_rec.record(h._ref_t)
+        v_rec.record(ref)
+
+    if cvode:
+        data = _run_cvode(t_rec, v_rec, dt, tstop, v_init, atol, rtol,
+                interpolate)
+        if stride > 1 and interpolate:
+            data = data[stride - 1::stride]
+        if window is not None:
+            data = data[_in_window(data[:, 0], window, dt)]
+        return data
+
+    # Simulation control
+    h.dt = dt
+    with profiling.span('finitialize'):
+        h.finitialize(v_init)
+        h.fcurrent()
+        if warm is not None:
+            warm.restore(t_rec, v_rec)
+
+    # Run simulation: same stopping rule as the former Python loop, t < tstop.
+    # hoc comparisons are fuzzy (float_epsilon), so switch that off for the
+    # loop, otherwise runs can end one step earlier than they used to.
+    epsilon = h.float_epsilon
+    h.float_epsilon = 0
+    try:
+        if reducers is not None:
+            return _run_reduced(reducers, t_rec, v_rec, tstop, check_every)
+        if window is not None:
+            return _run_window(t_rec, v_rec, tstop, window, dt, check_every)
+        if stop is None:
+            _advance(tstop)
+        else:
+            end, reason = _run_until(stop, t_rec, v_rec, tstop, check_every)
+    finally:
+        h.float_epsilon = epsilon
+
+    if stop is None:
+        end = len(t_rec)
+    with profiling.span('record'):
+        data = np.empty((end - 1, 2))
+        data[:, 0] = np.array(t_rec)[1:end]
+        data[:, 1] = np.array(v_rec)[1:end]
+    if stop is None:
+        return data
+    return data, reason
+
+def _advance(tstop, until=None):
+    """ Runs fadvance in hoc while t < tstop (and t < until) """
+    t0 = h.t
+    with profiling.span('fadvance'):
+        if until is None:
+            h('while (t < %.17g) { fadvance() }' % tstop)
+        else:
+            h('while (t < %.17g && t < %.17g) { fadvance() }' %
+                    (tstop, until))
+    profiling.count('steps', int(round((h.t - t0) / h.dt)))
+    profiling.count('sim_ms', h.t - t0)
+
+def _run_until(stop, t_rec, v_rec, tstop, check_every):
+    """ Advances to tstop in chunks of check_every ms, checking the stopping
+    conditions after each chunk. Returns (number of samples to keep,
+    reason). """
+    if not isinstance(stop, (list, tuple)):
+        stop = [stop]
+    start = 0
+    while h.t < tstop:
+        _advance(tstop, h.t + check_every)
+        with profiling.span('analysis'):
+            t, v = np.array(t_rec), np.array(v_rec)
+            for condition in stop:
+                idx = condition(t, v, start)
+                if idx is not None:
+                    return idx + 1, condition.reason
+        start = len(t)
+    return len(t_rec), 'tstop'
+
+def _run_reduced(reducers, t_rec, v_rec, tstop, check_every):
+    """ Advances to tstop in chunks of check_every ms, feeding each chunk to
+    the reducers and then emptying the recording vectors. Returns the
+    results of the reducers. """
+    for reducer in reducers.values():
+        reducer.start()
+    # t=0 is not part of the trace, as in the data returned normally
+    first = 1
+    while h.t < tstop:
+        _advance(tstop, h.t + check_every)
+        with profiling.span('analysis'):
+            t, v = np.array(t_rec)[first:], np.array(v_rec)[first:]
+            first = 0
+            t_rec.resize(0)
+            v_rec.resize(0)
+            for reducer in reducers.values():
+                reducer.update(t, v)
+    return dict((name, reducer.result())
+            for name, reducer in reducers.items())
+
+def _stride(record_every, dt):
+    """ Number of steps between recorded samples """
+    if record_every is None:
+        return 1
+    stride = int(round(record_every / dt))
+    if stride < 1 or abs(stride * dt - record_every) > 1e-9 * record_every:
+        raise ValueError("run_IClamp: record_every (%g ms) is not a multiple "
+                "of dt (%g ms)" % (record_every, dt))
+    return stride
+
+def _in_window(t, window, dt):
+    """ Which of the samples at times t are in window (t0, t1). t=0 never
+    is, as it is not part of the output. Times within half a step of t0 or
+    t1 count as equal to them. """
+    t0, t1 = window
+    return (t >= max(t0, dt) - .5*dt) & (t <= t1 + .5*dt)
+
+def _run_window(t_rec, v_rec, tstop, window, dt, check_every):
+    """ Advances to tstop or the end of *window*, emptying the recording
+    vectors every check_every ms until the window starts. Returns the
+    samples in the window. """
+    t0, t1 = window
+    end = min(tstop, t1 + .5*dt)
+    while h.t < t0 - .5*dt and h.t < end:
+        t_rec.resize(0)
+        v_rec.resize(0)
+        _advance(end, min(h.t + check_every, t0 - .5*dt))
+    _advance(end)
+    with profiling.span('record'):
+        t, v = np.array(t_rec), np.array(v_rec)
+        keep = _in_window(t, window, dt)
+        return np.transpose([t[keep], v[keep]])
+
+def _fixed_times(dt, tstop):
+    """ Times of the samples of a fixed step run (t=0 left out), with t
+    accumulated in half steps as fadvance does """
+    t = np.add.accumulate(np.ones(2 * int(tstop / dt + 2)) * (.5 * dt))[1::2]
+    return t[:np.searchsorted(t, tstop) + 1]
+
+# Mechanisms whose states are updated by a procedure, which CVode cannot
+# integrate
+NO_CVODE = ('hh2', 'hh2f')
+
+def _check_cvode():
+    """ Raises ValueError if a section has a mechanism of NO_CVODE: CVode
+    integrates every section of the process """
+    for sec in h.allsec():
+        for mechanism in NO_CVODE:
+            if sec.has_membrane(mechanism):
+                raise ValueError("run_IClamp: %s of %s cannot be used with "
+                        "cvode" % (mechanism, h.secname(sec=sec)))
+
+def _run_cvode(t_rec, v_rec, dt, tstop, v_init, atol, rtol, interpolate):
+    """ Integrates to tstop with CVode. Returns the samples (t=0 left out),
+    interpolated at the times of a fixed step run if *interpolate*. """
+    if interpolate:
+        grid = _fixed_times(dt, tstop)
+        tstop = grid[-1]
+    cv = h.CVode()
+    cv.active(1)
+    try:
+        cv.atol(atol)
+        cv.rtol(rtol)
+        with profiling.span('finitialize'):
+            h.finitialize(v_init)
+        with profiling.span('fadvance', cvode=True):
+            cv.solve(tstop)
+    finally:
+        cv.active(0)
+
+    t, v = np.array(t_rec), np.array(v_rec)
+    profiling.count('steps', len(t) - 1)
+    profiling.count('sim_ms', t[-1])
+    if interpolate:
+        return np.transpose([grid, np.interp(grid, t, v)])
+    return np.transpose([t[1:], v[1:]])
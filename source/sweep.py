@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Parameter sweeps: runs a simulation for every point of a parameter grid,
+#   spread over a pool of worker processes. Every worker has its own copy of
+#   the model, so the points can run side by side.
+#
+#   Sweeps too large for one machine run on MPI ranks instead (mpi=True),
+#   through NEURON's bulletin board: rank 0 posts the grid points, and every
+#   other rank takes the next one as soon as it is free. The whole script is
+#   started on every rank, e.g. on one machine:
+#
+#       mpiexec -n 4 python part2.py prob2_2_b --mpi
+#
+#   The ranks other than 0 stop at the first distributed sweep and only run
+#   grid points from then on; the results, and everything after the sweep,
+#   are on rank 0.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import itertools
+import multiprocessing
+
+import atexit
+
+import neuron
+import numpy as np
+
+import profiling
+
+h = neuron.h
+
+# Model and run function of the current worker process, set up once by
+# _init_worker.
+_model = None
+_build = None
+_run = None
+
+def _init_worker(build, run):
+    global _model, _build, _run
+    _model = build()
+    _build = build
+    _run = run
+
+def _run_point(point):
+    with profiling.span('sweep point', point=repr(point)):
+        return _run(_model, *point)
+
+def grid_points(axes):
+    """ Returns the list of points of the grid spanned by *axes*, the last axis
+    varying fastest (same order as nested for loops). """
+    return list(itertools.product(*axes))
+
+def _load_checkpoint(checkpoint, points):
+    """ Returns {grid index: value} of the points already in *checkpoint*,
+    checking that they belong to the grid. A last line cut short by an
+    interruption is dropped from the file. """
+    done = {}
+    if not os.path.exists(checkpoint):
+        return done
+    with open(checkpoint) as f:
+        lines = f.readlines()
+    if lines and not lines[-1].endswith('\n'):
+        lines.pop()
+        with open(checkpoint, 'w') as f:
+            f.writelines(lines)
+    for line in lines:
+        row = [float(x) for x in line.split()]
+        i = int(row[0])
+        if i >= len(points) or row[1:-1] != [float(p) for p in points[i]]:
+            raise ValueError("sweep: %s does not match the grid (line %r)"
+                    % (checkpoint, line))
+        done[i] = row[-1]
+    return done
+
+def _append_checkpoint(f, i, point, value):
+    """ Writes one completed point to the checkpoint and flushes it to disk """
+    f.write(' '.join('%.17g' % x for x in [i] + list(point) + [value]) + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+def _collect(results, points, values, f, verbose):
+    """ Stores the (grid index, value) *results* as they come in """
+    for i, value in results:
+        values[i] = value
+        if f is not None:
+            _append_checkpoint(f, i, points[i], value)
+        if verbose: print(points[i])
+
+################################
+# MPI
+################################
+
+# ParallelContext of the MPI ranks, set up by the first distributed sweep
+_pc = None
+
+def _bulletin_board():
+    """
+    Starts MPI and the bulletin board on the first call, returns the
+    ParallelContext. Only rank 0 returns: the other ranks run the points
+    they take from the board until the end of the program, then quit.
+    Without mpiexec there is a single rank, which runs the points itself.
+    """
+    global _pc
+    if _pc is None:
+        h.nrnmpi_init()
+        _pc = h.ParallelContext()
+        if _pc.nhost() > 1:
+            atexit.register(_done)
+        _pc.runworker()
+    return _pc
+
+def _done():
+    """ Releases the other ranks, once, when rank 0 exits. The interpreter
+    then exits normally, running the other atexit handlers (the profile of
+    profiling.py...). """
+    global _pc
+    pc, _pc = _pc, None
+    if pc is not None:
+        pc.done()
+        # end MPI as h.quit would, without leaving the interpreter
+        neuron.nrn_dll_sym('nrnmpi_terminate')()
+
+def _board_point(build, run, i, point):
+    """ Runs grid point *i* on the rank that took it from the board. The
+    model is built on the first point the rank gets. """
+    if _build is not build or _run is not run:
+        _init_worker(build, run)
+    return i, _run_point(point)
+
+def _board_results(pc, build, run, points, todo):
+    """ Posts the points *todo* on the board, yields their (grid index,
+    value) in the order they complete """
+    for i in todo:
+        pc.submit(_board_point, build, run, i, tuple(points[i]))
+    while pc.working():
+        i, value = pc.pyret()
+        yield int(i), value
+
+################################
+# Sweeps
+################################
+
+def sweep(build, run, axes, processes=None, chunksize=1, verbose=False,
+        checkpoint=None, mpi=False):
+    """
+    Runs *run* for every point of the grid spanned by *axes*, in a pool of
+    worker processes. Returns an array with one row per point: the parameter
+    values followed by the value returned by run, in the same order as nested
+    for loops over the axes. That is the layout the sweeps used to save with
+    np.savetxt.
+
+    INPUT
+
+    build - callable without arguments, returning the model. Called once in
+        each worker. It must be picklable (a module-level function).
+    run - callable run(model, *point), returning a number. Also module-level.
+    axes - list of sequences of parameter values, one per grid dimension
+    processes - number of workers. None uses all cores, 1 runs everything in
+        the calling process without a pool.
+    chunksize - number of points handed to a worker at a time
+    verbose - print each point as it completes
+    checkpoint - file to which every completed point is appended as soon as
+        it is done (grid index, parameters, value). If the file exists, the
+        points it lists are not run again, so an interrupted sweep resumes
+        where it stopped and returns the same array as an uninterrupted one.
+        The file is removed once the sweep is complete.
+    mpi - spread the points over the MPI ranks (see the top of this file)
+        instead of a pool. The sweep only returns on rank 0, which gets the
+        same array as without MPI. processes and chunksize are not used.
+    """
+    if mpi:
+        # before anything else: the other ranks must not touch the
+        # checkpoint
+        pc = _bulletin_board()
+    points = grid_points(axes)
+
+    done = {}
+    if checkpoint is not None:
+        done = _load_checkpoint(checkpoint, points)
+        if verbose and done:
+            print("Resuming: %d of %d points done" % (len(done), len(points)))
+    todo = [i for i in range(len(points)) if i not in done]
+    values = dict(done)
+
+    f = open(checkpoint, 'a') if checkpoint is not None else None
+    try:
+        if mpi:
+            results = _board_results(pc, build, run, points, todo)
+            _collect(results, points, values, f, verbose)
+        elif processes == 1:
+            _init_worker(build, run)
+            results = ((i, _run_point(points[i])) for i in todo)
+            _collect(results, points, values, f, verbose)
+        else:
+            pool = multiprocessing.Pool(processes, _init_worker, (build, run))
+            try:
+                results = pool.imap(_run_point, [points[i] for i in todo],
+                        chunksize)
+                _collect(zip(todo, results), points, values, f, verbose)
+            except BaseException:
+                # do not wait for the points still queued
+                pool.terminate()
+                raise
+            else:
+                pool.close()
+            finally:
+                pool.join()
+    finally:
+        if f is not None:
+            f.close()
+
+    if checkpoint is not None:
+        os.remove(checkpoint)
+
+    return np.array([list(point) + [values[i]]
+        for i, point in enumerate(points)])
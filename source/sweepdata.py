@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Binary storage of sweep results. A sweep is saved as a folder holding one
+#   .npy file per column (typed, and loadable with np.load(mmap_mode='r')) and
+#   a meta.json file naming the columns, the parameter axes of the grid and
+#   describing the model and stimulus that produced it. The part 2 sweeps
+#   also keep writing their .dat text files (np.savetxt) next to it, and
+#   convert turns those (or older ones) into this format.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import json
+
+import numpy as np
+
+META = 'meta.json'
+
+################################
+# Writing
+################################
+
+def _axis_values(column):
+    """ Distinct values of a parameter column, in order of first appearance
+    """
+    values, first = np.unique(column, return_index=True)
+    return values[np.argsort(first)]
+
+def _is_integer(values):
+    values = np.asarray(values, dtype=float)
+    return bool(np.all(values == np.round(values)))
+
+def save(path, rows, names, axes=None, dtypes=None, metadata=None):
+    """
+    Saves the rows returned by a sweep (parameters..., value) in folder
+    *path*.
+
+    INPUT
+    path - folder to write, created if needed (e.g. '../data/x.sweep')
+    rows - 2D array, one row per grid point
+    names - name of every column
+    axes - values of each parameter axis, for the first len(axes) columns.
+        If None, all columns but the last are parameters, and their values
+        are taken from the rows in order of appearance.
+    dtypes - {column name: dtype}. By default parameter columns are int64
+        when all their values are integers, and everything else float64.
+    metadata - dictionary describing the model and stimulus (JSON types)
+    """
+    rows = np.asarray(rows, dtype=float)
+    if rows.ndim != 2 or rows.shape[1] != len(names):
+        raise ValueError("sweepdata.save: %d names for rows of shape %s"
+                % (len(names), rows.shape))
+    if axes is None:
+        axes = [_axis_values(rows[:, k]) for k in range(len(names) - 1)]
+    dtypes = dict(dtypes or {})
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    columns = []
+    for k, name in enumerate(names):
+        if name not in dtypes:
+            param = k < len(axes) and _is_integer(axes[k])
+            dtypes[name] = 'int64' if param else 'float64'
+        dtype = np.dtype(dtypes[name])
+        np.save(os.path.join(path, name + '.npy'), rows[:, k].astype(dtype))
+        columns.append({'name': name, 'dtype': dtype.str})
+
+    meta = {
+        'columns': columns,
+        'axes': [{'name': names[k],
+            'values': np.asarray(values).astype(dtypes[names[k]]).tolist()}
+            for k, values in enumerate(axes)],
+        'rows': len(rows),
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(path, META), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+def convert(dat_path, path=None, names=None, metadata=None):
+    """
+    Converts a sweep saved with np.savetxt to the binary format. Column
+    names are read from a '# name name ...' header line if *names* is not
+    given. All columns but the last are taken as the parameter axes.
+    Returns the path of the new folder (dat_path with .sweep instead of
+    .dat by default).
+    """
+    if path is None:
+        path = os.path.splitext(dat_path)[0] + '.sweep'
+    if names is None:
+        with open(dat_path) as f:
+            first = f.readline()
+        if first.startswith('#'):
+            names = first[1:].split()
+    rows = np.loadtxt(dat_path, ndmin=2)
+    if names is None:
+        names = ['p%d' % k for k in range(rows.shape[1] - 1)] + ['value']
+    metadata = dict(metadata or {}, source=os.path.basename(dat_path))
+    save(path, rows, names, metadata=metadata)
+    return path
+
+################################
+# Reading
+################################
+
+class SweepData(object):
+
+    """
+    Sweep results loaded from a folder written by save(). Columns are
+    memory-mapped, so only what is used is read from disk.
+
+    columns - {name: array} in file order (names gives the order)
+    axes - list of (name, values) of the parameter axes
+    metadata - the model and stimulus description
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        self.names = [c['name'] for c in meta['columns']]
+        self.columns = dict((name, np.load(os.path.join(path, name + '.npy'),
+            mmap_mode=mmap_mode)) for name in self.names)
+        self.axes = [(a['name'], np.array(a['values'],
+            dtype=self.columns[a['name']].dtype)) for a in meta['axes']]
+        self.metadata = meta['metadata']
+
+    def __len__(self):
+        return len(self.columns[self.names[0]])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def shape(self):
+        """ Shape of the parameter grid """
+        return tuple(len(values) for name, values in self.axes)
+
+    def rows(self):
+        """ All columns as a 2D float array, the layout of the .dat files """
+        return np.column_stack([np.asarray(self.columns[name], dtype=float)
+            for name in self.names])
+
+    def grid(self, name=None):
+        """ Column *name* (the last one by default) as an N-dimensional array
+        over the parameter axes. Points missing from the sweep are NaN. """
+        if name is None:
+            name = self.names[-1]
+        column = self.columns[name]
+        shape = self.shape
+
+        # Complete grid in nested loop order: a plain reshape
+        if len(column) == np.prod(shape) and all(
+                np.array_equal(self.columns[axis],
+                    np.repeat(np.tile(values, int(np.prod(shape[:k]))),
+                        int(np.prod(shape[k + 1:]))))
+                for k, (axis, values) in enumerate(self.axes)):
+            return np.asarray(column).reshape(shape)
+
+        out = np.empty(shape, dtype=float)
+        out.fill(np.nan)
+        index = []
+        for axis, values in self.axes:
+            order = np.argsort(values)
+            pos = np.searchsorted(values, self.columns[axis], sorter=order)
+            index.append(order[pos])
+        out[tuple(index)] = column
+        return out
+
+def load(path, mmap_mode='r'):
+    """ Loads the sweep saved in folder *path* (see SweepData) """
+    return SweepData(path, mmap_mode)
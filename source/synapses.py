@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Lumped synapse banks. Identical AlphaSynapses at the same place add up to
+#   a single AlphaSynapse whose conductance is scaled by the number of active
+#   ones, so activating 1000 synapses costs as much per step as activating
+#   one. Used by the sections of the toolset when created with lumped=True.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import neuron
+
+h = neuron.h
+
+class LumpedSynapses(object):
+
+    """
+    Stands in for the list of synapses of a section. Synapses are stored in
+    banks, one AlphaSynapse per (position, tau, e) class, in the order they
+    were added.
+
+    len() is the number of synapses, as for the list, and iterating gives the
+    AlphaSynapse of every bank.
+    """
+
+    def __init__(self, sec):
+        self.sec = sec
+        self.banks = [] # [pos, tau, e, count, AlphaSynapse]
+
+    def add(self, N, pos=0.5, tau=2, e=0, gmax=0):
+        """ Adds N synapses at pos, each with conductance gmax (uS) """
+        for bank in self.banks:
+            if bank[:3] == [pos, tau, e]:
+                bank[3] += N
+                bank[4].gmax += N * gmax
+                return
+        syn = h.AlphaSynapse(pos, sec=self.sec)
+        syn.tau = tau
+        syn.e = e
+        syn.gmax = N * gmax
+        self.banks.append([pos, tau, e, N, syn])
+
+    def __len__(self):
+        return sum(bank[3] for bank in self.banks)
+
+    def __iter__(self):
+        return iter([bank[4] for bank in self.banks])
+
+    def reset(self):
+        """ Inactivates all synapses. """
+        for bank in self.banks:
+            bank[4].gmax = 0
+
+    def activate(self, onset=0, N=-1, gmax=0.005):
+        """ Activates the first N synapses at time 'onset', each with
+        conductance gmax. N is counted like synapses[:N] on the list, so -1
+        leaves out the last one.
+
+        The banks that are touched get exactly the activated synapses, so the
+        synapses should be reset before, as the simulations do. """
+        remaining = len(range(len(self))[:N])
+        for bank in self.banks:
+            count = min(remaining, bank[3])
+            if count == 0:
+                break
+            bank[4].gmax = count * gmax
+            bank[4].onset = onset
+            remaining -= count
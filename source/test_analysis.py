@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of the spike analysis and of the streaming reducers.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import warnings
+
+import numpy as np
+import pytest
+
+import simulation
+from analysis import EventWindows, spike_stats, spiketimes, spikefreq
+
+def _hh_trace():
+    from toolset import models
+    return simulation.run_IClamp(models.get('HH'), delay=50, dur=500,
+            amp=0.5, tstop=600)
+
+def _cut(data, pre, post, dt=0.025):
+    """ Windows around the crossings of 0 mV, cut from the whole trace """
+    t, v = data.transpose()
+    above = v > 0
+    idx = np.nonzero(~above[:-1] & above[1:])[0] + 1
+    return [data[(t >= t[i] - pre - dt/2) & (t <= t[i] + post + dt/2)]
+            for i in idx]
+
+@pytest.mark.parametrize('check_every', [0.1, 0.35, 1, 7.3])
+def test_event_windows_chunked(mechanisms, check_every):
+    """ Windows built chunk by chunk during the run are those cut from the
+    full trace, edges included """
+    from toolset import models
+    data = _hh_trace()
+    expected = _cut(data, 1.3, 2.7)
+    windows = simulation.run_IClamp(models.get('HH'), delay=50, dur=500,
+            amp=0.5, tstop=600, check_every=check_every,
+            reducers={'w': EventWindows(0, 1.3, 2.7)})['w']
+    assert len(windows) == len(expected) > 0
+    for window, cut in zip(windows, expected):
+        np.testing.assert_array_equal(window, cut)
+
+def test_event_windows_full(mechanisms):
+    """ The whole trace in one update gives the same windows """
+    data = _hh_trace()
+    reducer = EventWindows(0, 2, 5)
+    reducer.start()
+    reducer.update(data[:, 0], data[:, 1])
+    expected = _cut(data, 2, 5)
+    assert len(reducer.result()) == len(expected)
+    for window, cut in zip(reducer.result(), expected):
+        np.testing.assert_array_equal(window, cut)
+
+################################
+# spike_stats
+################################
+
+def _spikes(times, tstop=100, dt=0.025):
+    """ [time, voltage] trace at -70 mV with a 1 ms pulse to 30 mV at each
+    of *times* """
+    t = dt * np.arange(1, int(round(tstop / dt)) + 1)
+    v = np.full(len(t), -70.)
+    for t0 in times:
+        v[(t >= t0) & (t < t0 + 1)] = 30.
+    return np.column_stack([t, v])
+
+def test_spike_stats_matches_spiketimes():
+    traces = [_spikes([10, 30, 60]), _spikes([5, 50]), _spikes([20])]
+    stats = spike_stats(traces, interpolate=False)
+    for k, data in enumerate(traces):
+        np.testing.assert_array_equal(stats['times'][k], spiketimes(data))
+        assert stats['freq'][k] == spikefreq(data)
+    np.testing.assert_array_equal(stats['count'], [3, 2, 1])
+    assert stats['latency'][2] == spiketimes(traces[2])[0]
+    assert np.isnan(stats['isi_mean'][2]) and np.isnan(stats['isi_cv'][2])
+
+def test_spike_stats_grid():
+    """ A (K, n) array gives the same as the list of its traces """
+    traces = [_spikes([10, 30, 60]), _spikes([]), _spikes([5, 50])]
+    grid = spike_stats(np.array([d[:, 1] for d in traces]),
+            t=traces[0][:, 0])
+    stats = spike_stats(traces)
+    for name in ('count', 'latency', 'isi_mean', 'isi_cv', 'freq', 'peak'):
+        np.testing.assert_array_equal(grid[name], stats[name])
+
+def test_spike_stats_empty():
+    stats = spike_stats([])
+    assert stats['times'] == [] and len(stats['count']) == 0
+    stats = spike_stats(np.zeros((0, 10)), t=np.arange(10.))
+    assert len(stats['freq']) == 0
+
+def test_spike_stats_without_spikes():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        stats = spike_stats([_spikes([]), _spikes([40])])
+    np.testing.assert_array_equal(stats['count'], [0, 1])
+    np.testing.assert_array_equal(stats['freq'], [0, 0])
+    assert np.isnan(stats['latency'][0])
+    assert np.all(np.isnan(stats['isi_cv']))
+    assert len(stats['times'][0]) == 0
+
+def test_spike_stats_empty_traces():
+    """ Empty traces, first or not, have no spikes and do not shift those of
+    the others """
+    spiking = _spikes([10, 30])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        stats = spike_stats([np.zeros((0, 2)), spiking, np.zeros((0, 2)),
+            spiking])
+    np.testing.assert_array_equal(stats['count'], [0, 2, 0, 2])
+    assert np.isnan(stats['peak'][0]) and stats['peak'][1] == 30
+    np.testing.assert_array_equal(stats['times'][3], stats['times'][1])
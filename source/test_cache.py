@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of RunCache: cached traces are those of run_IClamp, and a change
+#   of the model or of the arguments is a miss.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+import cache
+import simulation
+
+def test_hits(mechanisms, tmp_path):
+    from toolset import models
+    sec = models.get('HH')
+    sec.reset_synapses()
+    runs = cache.RunCache(str(tmp_path))
+    data = runs.run_IClamp(sec, amp=0.5, tstop=40)
+    np.testing.assert_array_equal(runs.run_IClamp(sec, amp=0.5, tstop=40),
+            data)
+    np.testing.assert_array_equal(data,
+            simulation.run_IClamp(sec, amp=0.5, tstop=40))
+    assert (runs.hits, runs.misses) == (1, 1)
+
+    runs.run_IClamp(sec, amp=0.6, tstop=40)
+    assert (runs.hits, runs.misses) == (1, 2)
+    assert len(runs.files()) == 2
+    runs.clear()
+    assert runs.size() == 0
+
+def test_key(mechanisms):
+    from neuron import h
+    from toolset import models
+    sec = models.get('HH')
+    sec.reset_synapses()
+    key = cache.run_key(sec, amp=0.5)
+    assert cache.run_key(sec, amp=0.5) == key
+    assert cache.run_key(sec, amp=0.6) != key
+
+    # the model changed
+    gnabar = sec.gnabar_hh2
+    sec.gnabar_hh2 = 2 * gnabar
+    try:
+        assert cache.run_key(sec, amp=0.5) != key
+    finally:
+        sec.gnabar_hh2 = gnabar
+    assert cache.run_key(sec, amp=0.5) == key
+
+    # a section that is not connected to it does not matter
+    other = h.Section(name='unrelated')
+    assert cache.run_key(sec, amp=0.5) == key
+    del other
+
+def test_eviction(mechanisms, tmp_path):
+    from toolset import models
+    sec = models.get('HH')
+    sec.reset_synapses()
+    runs = cache.RunCache(str(tmp_path), max_bytes=1)
+    runs.run_IClamp(sec, amp=0.5, tstop=10)
+    assert runs.files() == []
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of CellBatch: every copy gives the trace run_IClamp gives for the
+#   model on its own.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+import pytest
+
+import cellbatch
+import simulation
+from cellbatch import CellBatch
+
+@pytest.mark.parametrize('threads', [1, 2])
+def test_amps(mechanisms, threads):
+    from toolset import models
+    sec = models.get('HHx')
+    sec.reset_synapses()
+    amps = [0, 2, 4.6]
+    batch = cellbatch.run_IClamp(sec, delay=10, dur=50, amp=amps, tstop=70,
+            threads=threads)
+    for amp, data in zip(amps, batch):
+        ref = simulation.run_IClamp(sec, delay=10, dur=50, amp=amp,
+                tstop=70)
+        np.testing.assert_array_equal(data, ref)
+
+def test_tree_synapses(mechanisms):
+    from toolset import models
+    tree = models.get('tree')
+    soma, dend1, dend2, dend3 = tree
+    batch = CellBatch('tree', 2)
+    try:
+        Ns = [5, 40]
+        refs = []
+        for cell, N in zip(batch.cells, Ns):
+            cell[2].activate_synapses(N=N, onset=1)
+        t, v = batch.run(sec=0, amp=0, dur=0, tstop=20, dt=0.01)
+        for cell in batch.cells:
+            cell[2].reset_synapses()
+        del batch, cell
+        for N in Ns:
+            dend2.activate_synapses(N=N, onset=1)
+            refs.append(simulation.run_IClamp(soma, amp=0, dur=0, tstop=20,
+                dt=0.01))
+            dend2.reset_synapses()
+    finally:
+        dend2.reset_synapses()
+    for vk, ref in zip(v, refs):
+        np.testing.assert_array_equal(t, ref[:, 0])
+        np.testing.assert_array_equal(vk, ref[:, 1])
+
+def test_copy_synapses_mismatch(mechanisms):
+    """ The copies would not behave as a model changed since it was built """
+    from toolset import models
+    sec = models.get('HH')
+    batch = CellBatch('HH', 2)
+    gnabar = sec.gnabar_hh2
+    sec.gnabar_hh2 = 2 * gnabar
+    try:
+        with pytest.raises(ValueError):
+            batch.copy_synapses(sec)
+    finally:
+        sec.gnabar_hh2 = gnabar
+    batch.copy_synapses(sec)
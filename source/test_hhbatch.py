@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of the NumPy integrators (hhbatch, cable): their traces are those
+#   of NEURON.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+import pytest
+
+import hhbatch
+import simulation
+from cable import CableTree
+
+# NEURON and the NumPy integrators only differ by round-off. The *_fast
+# models are left out: hh2f reads its rates from tables.
+ATOL = 1e-9
+
+@pytest.mark.parametrize('name, amp', [('HH', 0.5), ('HHx', 4.6),
+    ('HHxx', 0.26)])
+def test_soma_clamp(mechanisms, name, amp):
+    from toolset import models
+    sec = models.get(name)
+    sec.reset_synapses()
+    ref = simulation.run_IClamp(sec, delay=10, dur=100, amp=amp, tstop=150)
+    data = hhbatch.run_IClamp(sec, delay=10, dur=100, amp=amp, tstop=150)
+    assert data.shape == ref.shape
+    np.testing.assert_allclose(data, ref, rtol=0, atol=ATOL)
+
+def test_soma_synapses(mechanisms):
+    from toolset import models
+    sec = models.get('HHx')
+    sec.activate_synapses(N=25, onset=10)
+    try:
+        ref = simulation.run_IClamp(sec, amp=0, dur=0, tstop=50, dt=0.01)
+        data = hhbatch.run_IClamp(sec, amp=0, dur=0, tstop=50, dt=0.01)
+    finally:
+        sec.reset_synapses()
+    np.testing.assert_allclose(data, ref, rtol=0, atol=ATOL)
+
+def test_soma_batch(mechanisms):
+    """ A batch of currents gives the runs of each current """
+    from toolset import models
+    sec = models.get('HH')
+    sec.reset_synapses()
+    amps = [0, 0.3, 0.6]
+    batch = hhbatch.run_IClamp(sec, dur=50, amp=amps, tstop=50)
+    for amp, data in zip(amps, batch):
+        np.testing.assert_allclose(data, hhbatch.run_IClamp(sec, dur=50,
+            amp=amp, tstop=50), rtol=0, atol=1e-12)
+
+def test_soma_unsupported(mechanisms):
+    """ A mechanism SomaBatch does not integrate is refused """
+    from neuron import h
+    sec = h.Section(name='hh_soma')
+    sec.insert('hh')
+    with pytest.raises(ValueError):
+        hhbatch.run_IClamp(sec)
+
+@pytest.fixture
+def tree(mechanisms):
+    from toolset import models
+    tree = models.get('tree')
+    soma, dend1, dend2, dend3 = tree
+    dend2.reset_synapses()
+    dend3.reset_synapses()
+    if hasattr(dend1, 'inhib_synapse'):
+        dend1.reset_inhibitory_synapse()
+    yield tree
+    dend2.reset_synapses()
+    dend3.reset_synapses()
+
+def test_cable_synapses(tree):
+    soma, dend1, dend2, dend3 = tree
+    dend2.activate_synapses(N=30, onset=0)
+    dend3.activate_synapses(N=10, onset=2)
+    ref = simulation.run_IClamp(soma, amp=0, dur=0, tstop=25, dt=0.01)
+    cable = CableTree(list(tree))
+    cable.add_active_synapses(dend2)
+    cable.add_active_synapses(dend3)
+    t, v = cable.run(dt=0.01, tstop=25, record=(soma, 0.5))
+    np.testing.assert_allclose(t, ref[:, 0], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(v[0], ref[:, 1], rtol=0, atol=ATOL)
+
+def test_cable_batch(tree):
+    """ K configurations at once give the NEURON run of each """
+    soma, dend1, dend2, dend3 = tree
+    amps = np.array([0.05, 0.2])
+    cable = CableTree(list(tree), K=len(amps))
+    cable.add_IClamp(soma, delay=5, dur=10, amp=amps)
+    t, v = cable.run(tstop=20, record=(soma, 0.5))
+    for k, amp in enumerate(amps):
+        ref = simulation.run_IClamp(soma, delay=5, dur=10, amp=amp, tstop=20)
+        np.testing.assert_allclose(v[k], ref[:, 1], rtol=0, atol=ATOL)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of run_IClamp: the stopping conditions, reducers, recording
+#   windows, strided recording and warm starts give the samples of a plain
+#   run.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+import pytest
+
+from simulation import run_IClamp, StopOnSpike, WarmStart
+from analysis import Max, SpikeTimes, spiketimes
+
+CLAMP = dict(delay=50, dur=500, amp=0.5, tstop=300)
+
+@pytest.fixture
+def HH(mechanisms):
+    from toolset import models
+    sec = models.get('HH')
+    sec.reset_synapses()
+    return sec
+
+def test_stop_on_spike(HH):
+    full = run_IClamp(HH, **CLAMP)
+    data, reason = run_IClamp(HH, stop=StopOnSpike(0), **CLAMP)
+    assert reason == 'spike'
+    np.testing.assert_array_equal(data, full[:len(data)])
+    assert data[-1, 1] > 0 and data[-2, 1] <= 0
+
+def test_reducers(HH):
+    full = run_IClamp(HH, **CLAMP)
+    result = run_IClamp(HH, reducers={'max': Max(), 'spikes': SpikeTimes(0)},
+            check_every=3.3, **CLAMP)
+    assert result['max'] == full[:, 1].max()
+    np.testing.assert_array_equal(result['spikes'], spiketimes(full, 0))
+
+def test_window(HH):
+    full = run_IClamp(HH, **CLAMP)
+    data = run_IClamp(HH, window=(100, 150), **CLAMP)
+    t = full[:, 0]
+    np.testing.assert_array_equal(data,
+            full[(t >= 100 - 0.0125) & (t <= 150 + 0.0125)])
+
+def test_record_every(HH):
+    full = run_IClamp(HH, **CLAMP)
+    data = run_IClamp(HH, record_every=0.1, **CLAMP)
+    np.testing.assert_allclose(data[:, 1], full[3::4, 1][:len(data)])
+    np.testing.assert_allclose(data[:, 0], 0.1 * np.arange(1, len(data) + 1))
+
+def test_warm_start(HH):
+    HH.activate_synapses(N=10, onset=10)
+    cold = run_IClamp(HH, amp=0, dur=0, tstop=50, dt=0.01)
+    HH.reset_synapses()
+    warm = WarmStart(HH, 10, dt=0.01)
+    HH.activate_synapses(N=10, onset=10)
+    data = run_IClamp(HH, amp=0, dur=0, tstop=50, dt=0.01, warm=warm)
+    HH.reset_synapses()
+    np.testing.assert_array_equal(data, cold)
+
+def test_invalid_arguments(HH):
+    from neuron import h
+    clamps = h.List('IClamp').count()
+    with pytest.raises(ValueError):
+        run_IClamp(HH, stop=StopOnSpike(0), reducers={'max': Max()})
+    with pytest.raises(ValueError):
+        run_IClamp(HH, cvode=True, interpolate=False, record_every=0.1)
+    # hh2 has no derivative form
+    with pytest.raises(ValueError):
+        run_IClamp(HH, cvode=True)
+    assert h.List('IClamp').count() == clamps
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of sweep: the grid order, the pool of workers and the resuming of
+#   an interrupted sweep from its checkpoint.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+
+import numpy as np
+import pytest
+
+from sweep import sweep, grid_points
+
+AXES = [[1, 2, 3], [0.5, 1.5]]
+
+# Point at which run fails, to interrupt a sweep
+_fail_at = None
+_calls = []
+
+def build():
+    return 10.
+
+def run(model, a, b):
+    if (a, b) == _fail_at:
+        raise RuntimeError("interrupted")
+    _calls.append((a, b))
+    return model * a + b
+
+def _expected():
+    return np.array([[a, b, run(10., a, b)] for a in AXES[0]
+        for b in AXES[1]])
+
+def test_grid():
+    assert grid_points(AXES)[:3] == [(1, 0.5), (1, 1.5), (2, 0.5)]
+    np.testing.assert_array_equal(sweep(build, run, AXES, processes=1),
+            _expected())
+
+def test_pool():
+    np.testing.assert_array_equal(sweep(build, run, AXES, processes=2),
+            _expected())
+
+def test_checkpoint_resumes(tmp_path):
+    global _fail_at
+    checkpoint = str(tmp_path / 'sweep.txt')
+    _fail_at = (2, 1.5)
+    try:
+        with pytest.raises(RuntimeError):
+            sweep(build, run, AXES, processes=1, checkpoint=checkpoint)
+    finally:
+        _fail_at = None
+    with open(checkpoint) as f:
+        assert len(f.readlines()) == 3
+
+    # an interruption while writing leaves part of a line
+    with open(checkpoint, 'a') as f:
+        f.write('3 2 1.')
+    del _calls[:]
+    rows = sweep(build, run, AXES, processes=1, checkpoint=checkpoint)
+    assert _calls == [(2, 1.5), (3, 0.5), (3, 1.5)]
+    np.testing.assert_array_equal(rows, _expected())
+    assert not os.path.exists(checkpoint)
+
+def test_checkpoint_of_another_grid(tmp_path):
+    checkpoint = str(tmp_path / 'sweep.txt')
+    with open(checkpoint, 'w') as f:
+        f.write('0 7 7 1\n')
+    with pytest.raises(ValueError):
+        sweep(build, run, AXES, processes=1, checkpoint=checkpoint)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of the binary sweep format: saving and loading give back the rows,
+#   and the .sweep folders in data/ hold the same values as the .dat files.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+
+import numpy as np
+import pytest
+
+import sweepdata
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+        'data')
+
+def _rows():
+    return np.array([[n, onset, 0.1 * n + onset] for n in range(4)
+        for onset in (10., 12.5, 15.)])
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'x.sweep')
+    rows = _rows()
+    sweepdata.save(path, rows, ['N', 'onset', 'v'], metadata={'tstop': 50})
+    data = sweepdata.load(path)
+    np.testing.assert_array_equal(data.rows(), rows)
+    assert data['N'].dtype == np.int64 and data['onset'].dtype == float
+    assert data.shape == (4, 3)
+    np.testing.assert_array_equal(data.grid(), rows[:, 2].reshape(4, 3))
+    assert data.metadata == {'tstop': 50}
+
+def test_grid_missing_points(tmp_path):
+    path = str(tmp_path / 'x.sweep')
+    rows = _rows()[::-1][:-1]
+    sweepdata.save(path, rows, ['N', 'onset', 'v'],
+            axes=[range(4), [10., 12.5, 15.]])
+    grid = sweepdata.load(path).grid()
+    assert np.isnan(grid[0, 0])
+    np.testing.assert_array_equal(grid.ravel()[1:], _rows()[1:, 2])
+
+def test_convert(tmp_path):
+    dat = str(tmp_path / 'x.dat')
+    np.savetxt(dat, _rows(), header='N onset v')
+    path = sweepdata.convert(dat)
+    assert path == str(tmp_path / 'x.sweep')
+    data = sweepdata.load(path)
+    assert data.names == ['N', 'onset', 'v']
+    np.testing.assert_array_equal(data.rows(), _rows())
+
+@pytest.mark.parametrize('name', ['synaptic_summation',
+    'inhibitory_synapse'])
+def test_committed_data(name):
+    """ The .sweep folders of data/ reproduce their .dat files """
+    dat = os.path.join(DATA, name + '.dat')
+    rows = np.loadtxt(dat, ndmin=2)
+    np.testing.assert_array_equal(
+            sweepdata.load(os.path.join(DATA, name + '.sweep')).rows(), rows)
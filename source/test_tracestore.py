@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Tests of TraceStore: traces read back are those appended, with or
+#   without delta encoding, including after reopening the store.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+import pytest
+
+from tracestore import TraceStore
+
+def _trace(n, amp):
+    t = 0.025 * np.arange(1, n + 1)
+    return np.column_stack([t, -70 + amp * np.sin(t)])
+
+@pytest.mark.parametrize('delta', [False, True])
+def test_round_trip(tmp_path, delta):
+    path = str(tmp_path / 'traces.bin')
+    traces = [(0.5, _trace(100, 1)), (1.0, _trace(37, 5)), (2.0, _trace(0, 0))]
+    store = TraceStore(path, delta=delta)
+    for key, data in traces[:2]:
+        store.append(data, key)
+
+    # reopened: appends to the same file, with its settings
+    store = TraceStore(path, dtype='float32')
+    assert store.dtype == np.float64 and store.delta == delta
+    store.append(traces[2][1], traces[2][0])
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.keys, [0.5, 1.0, 2.0])
+    for (key, data), (stored_key, stored) in zip(traces, store.items()):
+        assert stored_key == key
+        np.testing.assert_allclose(stored, data, rtol=0, atol=1e-12)
+
+def test_float32(tmp_path):
+    store = TraceStore(str(tmp_path / 'traces.bin'), dtype='float32')
+    store.append(_trace(100, 1))
+    assert store[0].dtype == np.float32
+    np.testing.assert_allclose(store[0], _trace(100, 1), rtol=1e-6)
+    assert np.isnan(store.keys[0])
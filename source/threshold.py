@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Threshold search: the smallest number of synapses, synaptic conductance or
+#   clamp current that makes a model spike, found by bisection (or galloping
+#   search when there is no upper bound) instead of scanning hand-picked
+#   values. Every function returns the threshold together with the number of
+#   simulations it took.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 7 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+from simulation import run_IClamp
+from analysis import spiketimes
+
+################################
+# Generic search
+################################
+
+def _narrow(spikes, lo, hi, integer, tol):
+    """ Bisects [lo, hi], where spikes(lo) is False and spikes(hi) is True.
+    Returns (threshold, runs). """
+    runs = 0
+    while hi - lo > (1 if integer else tol):
+        mid = (lo + hi) // 2 if integer else (lo + hi) / 2.0
+        runs += 1
+        if spikes(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi, runs
+
+def bisect(spikes, lo, hi, integer=True, tol=1e-3):
+    """
+    Smallest x in [lo, hi] for which spikes(x) is True, assuming spikes is
+    False below the threshold and True above it. Returns (x, runs), x None if
+    spikes(hi) is False.
+
+    INPUT
+    spikes - function of x, returns True if the model spikes
+    lo, hi - search interval
+    integer - search integers only (number of synapses)
+    tol - width of the final interval for non-integer search. The upper end
+        of that interval is returned.
+    """
+    if spikes(lo):
+        return lo, 1
+    if not spikes(hi):
+        return None, 2
+    x, runs = _narrow(spikes, lo, hi, integer, tol)
+    return x, runs + 2
+
+def gallop(spikes, lo, step, integer=True, tol=1e-3, limit=None):
+    """
+    As bisect, without an upper bound: tries lo + step, lo + 2*step,
+    lo + 4*step, ... until the model spikes, then bisects the last interval.
+    Gives up at *limit* if given. Returns (x, runs).
+    """
+    if spikes(lo):
+        return lo, 1
+    runs = 1
+    hi = lo + step
+    while True:
+        if limit is not None and hi >= limit:
+            hi = limit
+        runs += 1
+        if spikes(hi):
+            break
+        if hi == limit:
+            return None, runs
+        lo, step = hi, 2 * step
+        hi = lo + step
+    x, more = _narrow(spikes, lo, hi, integer, tol)
+    return x, runs + more
+
+################################
+# Thresholds of the models
+################################
+
+def _spikes(rec_sec, v_th, clamp):
+    """ Runs a current clamp on rec_sec, True if it spikes """
+    data = run_IClamp(rec_sec, **clamp)
+    return len(spiketimes(data, v_th=v_th)) > 0
+
+def min_synapses(syn_sec, rec_sec=None, onset=10, v_th=0, gmax=None,
+        **clamp):
+    """
+    Smallest number of synapses of *syn_sec* that must be activated for
+    *rec_sec* to spike. Returns (N, runs), N None if all of them are not
+    enough.
+
+    INPUT
+    syn_sec - section holding the synapses (DefaultSection / DefaultDendrite)
+    rec_sec - section where spikes are detected, syn_sec by default
+    onset - activation time of the synapses, in ms
+    v_th - spike detection threshold, in mV
+    gmax - conductance per synapse, the section's default if None
+    clamp - arguments for run_IClamp (amp, tstop, dt, ...)
+    """
+    if rec_sec is None:
+        rec_sec = syn_sec
+    clamp.setdefault('amp', 0)
+    options = {'onset': onset}
+    if gmax is not None:
+        options['gmax'] = gmax
+
+    def spikes(N):
+        syn_sec.reset_synapses()
+        syn_sec.activate_synapses(N=N, **options)
+        return _spikes(rec_sec, v_th, clamp)
+
+    try:
+        return bisect(spikes, 0, len(syn_sec.synapses))
+    finally:
+        syn_sec.reset_synapses()
+
+def min_gmax(syn_sec, N, rec_sec=None, onset=10, v_th=0, step=0.001,
+        tol=1e-5, **clamp):
+    """
+    Smallest conductance per synapse (uS) for which N activated synapses of
+    *syn_sec* make *rec_sec* spike, to within *tol*. Returns (gmax, runs).
+    Arguments as min_synapses; step is the first guess of the galloping
+    search.
+    """
+    if rec_sec is None:
+        rec_sec = syn_sec
+    clamp.setdefault('amp', 0)
+
+    def spikes(gmax):
+        syn_sec.reset_synapses()
+        syn_sec.activate_synapses(N=N, onset=onset, gmax=gmax)
+        return _spikes(rec_sec, v_th, clamp)
+
+    try:
+        return gallop(spikes, 0, step, integer=False, tol=tol)
+    finally:
+        syn_sec.reset_synapses()
+
+def rheobase(sec, lo=0, hi=None, step=0.1, tol=1e-3, v_th=0, **clamp):
+    """
+    Smallest IClamp amplitude (nA) that makes *sec* spike, to within *tol*.
+    Searches [lo, hi] by bisection, or gallops up from lo by *step* if hi is
+    None. Returns (amp, runs).
+
+    clamp - other arguments of run_IClamp (delay, dur, tstop, dt, ...)
+    """
+    def spikes(amp):
+        return _spikes(sec, v_th, dict(clamp, amp=amp))
+
+    if hi is None:
+        return gallop(spikes, lo, step, integer=False, tol=tol)
+    return bisect(spikes, lo, hi, integer=False, tol=tol)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   The toolset: model definitions (neurons) and helper functions (such as I
+#   Clamp tests and visualisation functions) for both parts of the project.
+#
+#   sections - DefaultSection, DefaultDendrite (part 1), TreeSoma,
+#              TreeDendrite (part 2)
+#   models   - registry of the models, built on first use
+#   plotting - visualisation, importing matplotlib on first use, decimation
+#              of long traces and parallel rendering of figures
+#
+#   from toolset import * gives all of the above and the simulation and
+#   analysis functions. plt stands in for matplotlib.pyplot until a plot is
+#   drawn, so importing the toolset does not import matplotlib.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import numpy as np
+
+from simulation import run_IClamp
+from analysis import spiketimes, spikefreq, spike_stats
+from .sections import (h, DefaultSection, DefaultDendrite, TreeSoma,
+        TreeDendrite)
+from .plotting import (plt, quick_IClamp, U_vs_t, f_vs_I, figsave, newplot,
+        colours, decimate, plot_trace, render)
+from . import models
+
+__all__ = ['h', 'np', 'plt', 'models', 'run_IClamp', 'spiketimes',
+        'spikefreq', 'spike_stats', 'DefaultSection', 'DefaultDendrite',
+        'TreeSoma', 'TreeDendrite', 'quick_IClamp', 'U_vs_t', 'f_vs_I',
+        'figsave', 'newplot', 'colours', 'decimate', 'plot_trace', 'render']
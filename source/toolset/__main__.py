@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   One I clamp run of a registered model from the command line. Only that
+#   model is built, and matplotlib is only imported with --plot.
+#
+#   python -m toolset HH --amp 0.5 --dur 500 --tstop 600
+#   python -m toolset tree --amp 0.1 --output v.npy
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import sys
+import argparse
+
+import numpy as np
+
+from simulation import run_IClamp
+from analysis import spiketimes, spikefreq
+from . import models
+from .plotting import plt, U_vs_t
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m toolset',
+            description='I clamp run of a model')
+    parser.add_argument('model', help=', '.join(sorted(models.MODELS)))
+    parser.add_argument('--delay', type=float, default=0)
+    parser.add_argument('--dur', type=float, default=100)
+    parser.add_argument('--amp', type=float, default=0.5)
+    parser.add_argument('--dt', type=float, default=0.025)
+    parser.add_argument('--tstop', type=float, default=100)
+    parser.add_argument('--v_th', type=float, default=0,
+            help='spike threshold, mV')
+    parser.add_argument('--output', help='save the [t, v] rows (.npy)')
+    parser.add_argument('--plot', action='store_true')
+    args = parser.parse_args(argv)
+
+    model = models.get(args.model)
+    # the soma of a tree is clamped and recorded
+    sec = model[0] if isinstance(model, tuple) else model
+    data = run_IClamp(sec, delay=args.delay, dur=args.dur, amp=args.amp,
+            dt=args.dt, tstop=args.tstop)
+
+    print("%s: %d spikes, %.4f kHz, max %.2f mV" % (args.model,
+        len(spiketimes(data, v_th=args.v_th)),
+        spikefreq(data, v_th=args.v_th), data[:,1].max()))
+    if args.output:
+        np.save(args.output, data)
+    if args.plot:
+        U_vs_t(data)
+        plt.show()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
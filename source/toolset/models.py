@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Registry of the models of the project. A model is built the first time
+#   it is asked for, and the same sections are returned afterwards, so a
+#   script only pays for the models it uses:
+#
+#       HH = models.get('HH')
+#       soma, dend1, dend2, dend3 = models.get('tree')
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+from .sections import h, DefaultSection, TreeSoma, TreeDendrite
+
+# name: (build, celsius). build() takes no arguments and returns the model.
+MODELS = {}
+
+# Models built so far, by name
+_built = {}
+
+# Models that are attached to another one: name: the other model
+_depends = {}
+
+def register(name, celsius=6.3):
+    """ Decorator registering build() as model *name*, simulated at
+    *celsius* degrees """
+    def decorate(build):
+        MODELS[name] = (build, celsius)
+        return build
+    return decorate
+
+def get(name):
+    """ Model *name*, built on the first call. Also sets h.celsius to the
+    temperature of the model: part 1 and part 2 use different ones, so get
+    the model again before simulating it if the other part ran since. """
+    build, celsius = MODELS[name]
+    h.celsius = celsius
+    if name not in _built:
+        _built[name] = build()
+    return _built[name]
+
+def built(name):
+    """ Whether model *name* has been built already """
+    return name in _built
+
+def copies(name, K):
+    """ K new copies of model *name*, independent of the one get returns and
+    of each other, for batched runs (see cellbatch.py). Sets h.celsius as
+    get. A model built on top of another one (dend4) cannot be copied. """
+    build, celsius = MODELS[name]
+    if name in _depends:
+        raise ValueError("models: %s is part of %s, it has no independent "
+                "copies" % (name, _depends[name]))
+    h.celsius = celsius
+    return [build() for k in range(K)]
+
+def find(sec):
+    """ (name, index) of the built model that section *sec* belongs to,
+    index being its place in the tuple of sections of the model (None for a
+    single section model), or None if sec is not part of a built model """
+    for name, model in _built.items():
+        if model is sec:
+            return name, None
+        if isinstance(model, tuple):
+            for i, s in enumerate(model):
+                if s is sec:
+                    return name, i
+
+################################
+# Part 1
+################################
+
+# The three somas: HH, and HH with the ix or ixx current
+
+@register('HH', celsius=36)
+def build_HH():
+    return DefaultSection("HH")
+
+@register('HHx', celsius=36)
+def build_HHx():
+    HHx = DefaultSection("HHx")
+    HHx.insert("ix")
+    return HHx
+
+@register('HHxx', celsius=36)
+def build_HHxx():
+    HHxx = DefaultSection("HHxx")
+    HHxx.insert("ixx")
+    return HHxx
+
+# The same somas with the optimized mechanisms: hh2 rates from tables
+# (HH_traub_fast.mod), ix and ixx integrated with cnexp (I_x*_fast.mod)
+
+@register('HH_fast', celsius=36)
+def build_HH_fast():
+    return DefaultSection("HH_fast", 'hh2f')
+
+@register('HHx_fast', celsius=36)
+def build_HHx_fast():
+    HHx = DefaultSection("HHx_fast", 'hh2f')
+    HHx.insert("ixf")
+    return HHx
+
+@register('HHxx_fast', celsius=36)
+def build_HHxx_fast():
+    HHxx = DefaultSection("HHxx_fast", 'hh2f')
+    HHxx.insert("ixxf")
+    return HHxx
+
+################################
+# Part 2
+################################
+
+@register('tree')
+def build_tree():
+    """ The (soma, dend1, dend2, dend3) tree """
+    # Create HH soma, a 18 um x 18 um
+    soma = TreeSoma('soma', 'hh')
+
+    # Attach a dendrite directly to the soma
+    dend1 = TreeDendrite("Dend. 1")
+    dend1.connect(soma, 0, 1)
+    dend1.insert('pas')
+    dend1.reset_synapses()
+
+    # Attach two dendrites to the first, forming a y, and add synapses at
+    # their other extremity
+    dend2 = TreeDendrite("Dend. 2")
+    dend2.connect(dend1, 0, 1)
+    dend2.insert_synapses(N=100)
+    dend2.insert('ix')
+    dend2.gkbar_ix = 2e-5
+    dend2.reset_synapses()
+
+    dend3 = TreeDendrite("Dend. 3")
+    dend3.connect(dend1, 0, 1)
+    dend3.insert_synapses()
+    dend3.insert('ixx')
+    dend3.reset_synapses()
+
+    return soma, dend1, dend2, dend3
+
+# 1000 synapses only cost one point process when lumped
+_depends['dend4'] = 'tree'
+
+@register('dend4')
+def build_dend4():
+    """ A dendrite with 1000 lumped synapses, on dend1 of the tree. It is
+    part of the tree from then on, so only ask for it in its own process. """
+    soma, dend1, dend2, dend3 = get('tree')
+    dend4 = TreeDendrite("dend4", lumped=True)
+    dend4.connect(dend1, 0, 1)
+    dend4.insert_synapses(N=1000)
+    return dend4
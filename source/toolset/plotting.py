@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   This file contains the helper functions for I Clamp tests and
+#   visualisation. matplotlib is only imported when one of them draws
+#   something, so scripts and sweep workers that only simulate start without
+#   it. Long traces are decimated to the resolution of the axes before they
+#   are drawn, and independent figures can be rendered in worker processes
+#   (see render).
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import multiprocessing
+
+import numpy as np
+
+from simulation import run_IClamp
+from analysis import spike_stats
+from profiling import timed
+
+class _Pyplot(object):
+
+    """ Stands in for matplotlib.pyplot, which is imported the first time
+    one of its attributes is used. plt.figure(), plt.cm.jet, ... work as
+    with the module itself. """
+
+    def __getattr__(self, name):
+        import matplotlib.pyplot
+        return getattr(matplotlib.pyplot, name)
+
+plt = _Pyplot()
+
+################################
+# Decimation
+################################
+
+def decimate(t, v, buckets):
+    """
+    Returns (t, v) reduced to at most 2*buckets + 2 samples for drawing: the
+    trace is cut into *buckets* runs of consecutive samples, and only the
+    minimum and maximum of each run are kept, in time order, with the first
+    and last samples. Every peak and trough is drawn at its true height, and
+    with a few buckets per pixel the line looks the same as with all
+    samples. Traces that are already short enough are returned unchanged.
+
+    INPUT
+    t, v - 1D arrays of time and voltage
+    buckets - number of runs, a few per pixel of the axes width
+    """
+    t = np.asarray(t)
+    v = np.asarray(v)
+    n = len(v)
+    buckets = int(buckets)
+    if buckets < 1 or n <= 2*buckets + 2:
+        return t, v
+    size = -(-n // buckets) # samples per bucket, rounded up
+    padded = np.empty(size * buckets, dtype=v.dtype)
+    padded[:n] = v
+    padded[n:] = v[-1]
+    runs = padded.reshape(buckets, size)
+    offset = np.arange(buckets) * size
+    idx = np.concatenate(([0, n - 1], offset + runs.argmin(axis=1),
+        offset + runs.argmax(axis=1)))
+    idx = np.unique(np.minimum(idx, n - 1))
+    return t[idx], v[idx]
+
+# Buckets per pixel of the axes when decimating to their width. With one,
+# the steep flanks of spikes are already drawn a little differently; with
+# four, few pixels differ from the full trace (checked on a 600 ms, dt=0.01
+# spike train).
+BUCKETS_PER_PIXEL = 4
+
+def _axes_width(ax):
+    """ Width of *ax* in pixels, at the dpi of its figure """
+    fig = ax.figure
+    return ax.get_position().width * fig.get_figwidth() * fig.dpi
+
+def plot_trace(ax, t, v, *args, **kwargs):
+    """
+    ax.plot(t, v, *args, **kwargs) with the trace decimated to the width of
+    the axes, BUCKETS_PER_PIXEL buckets per pixel (see decimate). Pass
+    resolution=N to use N buckets instead, e.g. to zoom on part of the trace
+    later, or resolution=None to draw every sample.
+    """
+    resolution = kwargs.pop('resolution', 'auto')
+    if resolution == 'auto':
+        resolution = BUCKETS_PER_PIXEL * _axes_width(ax)
+    if resolution is not None:
+        t, v = decimate(t, v, resolution)
+    return ax.plot(t, v, *args, **kwargs)
+
+################################
+# Testing and simulation control
+################################
+
+def quick_IClamp(sec, pos=0.5, delay=0, dur=100, amp=10, dt=0.025, tstop=30,
+        v_init=-70):
+    """
+
+    Quick "debug" run of a I clamp. Runs the simulation and displays a graph.
+    Intented for interactive use.
+
+    """
+
+    data = run_IClamp(sec, pos, delay, dur, amp, dt, tstop, v_init)
+    t, v = np.transpose(data)
+
+    ax = plt.axes()
+    ax.plot(t, v, 'k-')
+    ax.set_xlabel("Time [ms]")
+    ax.set_ylabel("Membrane Potential [mV]")
+    plt.show()
+
+################################
+# Visualisation
+################################
+
+@timed('matplotlib')
+def U_vs_t(data, linestyle='k-', ax=None, resolution='auto'):
+    """ Returns a U vs t plot for data
+
+    INPUT
+
+    data - an array of [t, v] pairs
+    linestyle - matlab-style code for the linestyle
+    resolution - number of min/max buckets the trace is decimated to, set
+        from the width of the axes by default (see plot_trace). None draws
+        every sample.
+    """
+    if ax is None: # no axes provided, set up some:
+        ax = plt.axes()
+        ax.set_xlabel("Time [ms]")
+        ax.set_ylabel("Membrane potential [mV]")
+
+    t, v = np.transpose(data)
+    plot_trace(ax, t, v, linestyle, resolution=resolution)
+    ax.set_ylim(-80, 100)
+
+    return ax
+
+@timed('matplotlib')
+def f_vs_I(data, linestyle='-', label="", color="black", v_th=-40):
+    """ Returns plot of spiking frequency versus stimulation current
+
+    INPUT
+
+    data - a list of [I, clampdata] pairs, where clampdata is an array of [t,
+    v] pairs. Any iterable of pairs works, e.g. TraceStore.items().
+    linestyle - matlab-style code for the linestyle
+
+    """
+    ax = plt.axes()
+    ax.set_xlabel("Current [nA]")
+    ax.set_ylabel("Spiking Frequency [kHz]")
+
+    # All traces in one vectorized pass, read from data as it goes. Spike
+    # times are those of spikefreq, the first sample above v_th.
+    I = []
+    def traces():
+        for current, d in data:
+            I.append(current)
+            yield d
+    f = spike_stats(traces(), v_th=v_th, interpolate=False)['freq']
+    ax.plot(I, f, linestyle, color=color, label=label)
+
+    return ax
+
+@timed('matplotlib')
+def figsave(filename, size=[20, 8], folder="../figures/"):
+    """
+    Saves the current graph. this is just a shortcut to avoid having to specify
+    the folder and figure size everytime.
+
+    INPUT
+
+    filename - Name of the file. Extension determines filetype
+    size - figsize, as a two-element list. Unused: savefig used to ignore
+        it, and current matplotlib rejects it, so figures keep their size.
+    folder - folder to save the figures in.
+
+    """
+
+    plt.savefig(os.path.join(folder, filename))
+
+def newplot(xlabel=None, ylabel=None, title=None):
+    """
+    Returns a new set of labelled axes for plotting.
+
+    INPUT
+    xlabel - x-axis label
+    ylabel - y-axis label
+    title - figure title
+    """
+    fig = plt.figure(figsize=[5.3, 3])
+    fig.subplots_adjust(left=0.15, bottom=0.15)
+    ax = plt.axes()
+    if xlabel is not None: ax.set_xlabel(xlabel)
+    if ylabel is not None: ax.set_ylabel(ylabel)
+    # if title  is not None: ax.set_title(title)
+
+    return ax
+
+colours = lambda N: [plt.cm.jet(i/float(N)) for i in range(N)]
+
+################################
+# Rendering
+################################
+
+def _init_renderer():
+    """ Worker processes draw with the Agg backend (the PDF backend for .pdf
+    files), without a display """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def _render(job):
+    draw, args, filename, folder = job
+    fig = plt.figure()
+    draw(*args)
+    figsave(filename, folder=folder)
+    plt.close(plt.gcf())
+    plt.close(fig)
+    return filename
+
+def render(jobs, folder="../figures/", processes=None):
+    """
+    Draws and saves independent figures, side by side in worker processes.
+    Returns the list of saved file names.
+
+    INPUT
+    jobs - list of (draw, args, filename): draw(*args) draws one figure,
+        on a new figure of its own (newplot) or on the empty current one,
+        which is then saved with figsave(filename) and closed. draw and
+        args must be picklable: draw is a module-level function, and args
+        hold the data, not NEURON sections.
+    folder - folder to save the figures in
+    processes - number of workers. None uses all cores, 1 draws everything
+        in this process with the current backend.
+    """
+    jobs = [(draw, tuple(args), filename, folder)
+            for draw, args, filename in jobs]
+    if processes == 1 or len(jobs) < 2:
+        return [_render(job) for job in jobs]
+    pool = multiprocessing.Pool(processes, _init_renderer)
+    try:
+        return pool.map(_render, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   This file contains the model definitions (neurons): the somas and
+#   dendrites of part 1 (DefaultSection, DefaultDendrite) and those of the
+#   dendritic tree of part 2 (TreeSoma, TreeDendrite).
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 14th April 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import neuron
+import nrn
+
+from synapses import LumpedSynapses
+from profiling import timed
+
+# The HH_traub and IM_cortex models should be imported automatically.
+
+h = neuron.h
+
+##############################
+# Part 1
+##############################
+
+# Define a generic section class, that will be used to initalize the three
+# models HH, HHx, and HHxx, then customised.
+
+class DefaultSection(nrn.Section):
+
+    """ Defines the default values for all the somas we will use.
+
+    With lumped=True, the 40 synapses are a single point process whose
+    conductance scales with the number of activated synapses. """
+
+    # default conductance of activate_synapses, uS
+    synapse_gmax = 0.005
+    # length and diameter, um
+    size = 67
+    # number of synapses created (inactive)
+    synapse_count = 40
+    # reversal potential of the leak of hh, mV (None keeps the default)
+    el_hh_default = None
+
+    @timed('setup')
+    def __init__(self, name, mechanism='hh2', lumped=False):
+        nrn.Section.__init__(self)
+        self.name = name
+
+        self.L = self.size      # um length
+        self.diam = self.size   # same for diameter
+        self.Ra = 100      # intracellular resistivity
+        self.cm = 1         # capacitance
+
+        # Add passive membrane mechanism
+        if mechanism in ('hh2', 'hh2f'):
+            self.insert('pas')
+            self(0.5).pas.g = 0.00015 # conductivity
+            self(0.5).pas.e = -70.0   # reversal potential
+
+        # And H-H model, with a sodium and potassium channel.
+        self.insert(mechanism)
+        if mechanism == 'hh':
+            self.gl_hh = 0.0001
+            self.gna_hh = 0.2
+            if self.el_hh_default is not None:
+                self.el_hh = self.el_hh_default
+        if mechanism in ('hh2', 'hh2f'):
+            # hh2f is hh2 with tabulated rates (HH_traub_fast.mod)
+            self.ek = -100
+            self.ena = 50
+            setattr(self, 'vtraub_' + mechanism, -55)
+            setattr(self, 'gnabar_' + mechanism, 0.05)
+            setattr(self, 'gkbar_' + mechanism, 0.005)
+
+        # And 40 alpha synapses equally distributed along the section:
+        self.lumped = lumped
+        if lumped:
+            self.synapses = LumpedSynapses(self)
+            self.synapses.add(self.synapse_count, 0.5, tau=2, e=0, gmax=0)
+        else:
+            self.synapses = []
+            for i in range(self.synapse_count):
+                # TODO check units
+                syn = h.AlphaSynapse(0.5, sec=self)
+                syn.tau = 2 # 2 ms
+                syn.e = 0   # 0 mV reversal potential
+                syn.gmax = 0.005*0 # uS, initially inactive
+                self.synapses.append(syn)
+
+    def reset_synapses(self):
+        """ Inactivates all synapses. """
+        if self.lumped:
+            self.synapses.reset()
+            return
+        [ setattr(syn, 'gmax', 0) for syn in self.synapses ]
+
+    def activate_synapses(self, onset=0, N=-1, gmax=None):
+        """ Activates N synapses at time 'onset', setting them to conductance
+        gmax.
+
+        INPUT
+        onset - time of activation, in ms
+        N - number of synapses to activate. -1 to activate all
+        gmax - maximum conductance when active, synapse_gmax by default
+        """
+        if gmax is None:
+            gmax = self.synapse_gmax
+        if self.lumped:
+            self.synapses.activate(onset, N, gmax)
+            return
+        [ (setattr(syn, 'gmax', gmax), setattr(syn, 'onset', onset))
+                for syn in self.synapses[:N] ]
+
+class DefaultDendrite(DefaultSection):
+
+    """
+    Defines the default values for the dendrites we will use.
+
+    This class just sets constants. Connections have to be established after
+    instantiation.
+
+    All the methods from DefaultSection are inherited, therefore reset_synapses
+    and activate_synapses also available.
+    """
+
+    # conductance of the synapses made by insert_synapses, uS
+    inserted_gmax = 0.002
+    # default conductance of the inhibitory synapse, uS
+    inhibitory_gmax = -0.01
+    # set the passive conductance on every segment, not only the middle one
+    uniform_pas = False
+
+    @timed('setup')
+    def __init__(self, lumped=False, name=None):
+        nrn.Section.__init__(self)
+        if name is not None:
+            self.name = name
+
+        self.Ra = 123       # ohm*cm intracellular resistivity
+        self.cm = 2         # uF/cm^2 capacitance
+        self.L = 500        # um length
+        self.diam = 3       # um length
+
+        # Passive mechanism
+        self.insert('pas')
+        self.nseg = 50
+        where = self if self.uniform_pas else self(0.5)
+        where.g_pas = 0.0001   # S/cm^2 conductance
+        where.e_pas = -70.0    # mV reversal potential
+
+        # no synapses initially. When lumped, identical synapses share a
+        # single point process (see synapses.py)
+        self.lumped = lumped
+        self.synapses = LumpedSynapses(self) if lumped else []
+
+    @timed('setup')
+    def insert_synapses(self, N=50, pos=0.5):
+        """ Creates N synapses at pos """
+        if self.lumped:
+            self.synapses.add(N, pos, tau=2, e=0, gmax=self.inserted_gmax)
+            return
+        for i in range(N):
+            syn = h.AlphaSynapse(pos, sec=self)
+            syn.tau = 2 # ms
+            syn.e = 0   # mV reversal potential
+            syn.gmax = self.inserted_gmax # uS
+            self.synapses.append(syn)
+
+    def insert_inhibitory_synapse(self, pos=0.5, gmax=None):
+        """ Create an inhibitory synapse at position pos """
+        syn = h.AlphaSynapse(pos, sec=self)
+        syn.tau = 5 # ms
+        syn.e = -70 # mV reversal potential
+        syn.gmax = self.inhibitory_gmax if gmax is None else gmax
+        self.inhib_synapse = syn
+
+    def activate_inhibitory_synapse(self, onset=10, gmax=-0.01):
+        self.inhib_synapse.onset = onset
+        self.inhib_synapse.gmax = gmax
+
+    def reset_inhibitory_synapse(self):
+        self.inhib_synapse.gmax = 0
+
+##############################
+# Part 2
+##############################
+
+# The soma and dendrites of the tree of part 2: a smaller soma with the
+# standard hh channels, and dendrites whose synapses are created inactive.
+
+class TreeSoma(DefaultSection):
+
+    """ Defines the default values of the soma of the part 2 tree. It has no
+    synapses of its own. """
+
+    synapse_gmax = 0.002
+    size = 18
+    synapse_count = 0
+    el_hh_default = -70.0
+
+    def __init__(self, name, mechanism='hh'):
+        super().__init__(name, mechanism)
+
+class TreeDendrite(DefaultDendrite):
+
+    """ Defines the default values of the dendrites of the part 2 tree. Unlike
+    DefaultDendrite, the passive conductance is set on every segment, and
+    synapses are created inactive. """
+
+    synapse_gmax = 0.002
+    inserted_gmax = 0
+    inhibitory_gmax = 0
+    uniform_pas = True
+
+    def __init__(self, name, lumped=False):
+        super().__init__(lumped, name)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: UTF8 -*-
+#
+#   NEURON miniproject, for the course "Neural networks and
+#   biological modelling"
+#
+#   Trace store: many (time, voltage) traces of varying length appended to a
+#   single binary file, with an index of where each one starts. Traces are
+#   read back through a memory map, so a sweep of thousands of runs can be
+#   written to disk as it goes and analysed later one trace at a time.
+#
+#   AUTHOR: Thibault Dupont <thibault.dupont@epfl.ch>
+#           Douglas Watson <douglas@watsons.ch>
+#
+#   DATE: started on 23 May 2011
+#
+#   LICENSE: GNU GPL
+#
+#################################################
+
+import os
+import json
+
+import numpy as np
+
+# One record of the index per trace: where its first value is in the data
+# file (counted in values), its shape and its key (e.g. the clamp current).
+INDEX = np.dtype([('offset', '<i8'), ('rows', '<i8'), ('cols', '<i8'),
+    ('key', '<f8')])
+
+class TraceStore(object):
+
+    """
+    Traces stored in file *path*, with the index in path.idx and the
+    settings in path.json. Opening an existing store appends to it; its
+    settings are read from path.json.
+
+    len() is the number of traces, store[i] is trace i as a (rows, cols)
+    array and iterating gives all traces in order.
+
+    INPUT
+    path - data file
+    dtype - 'float64', or 'float32' to halve the file size
+    delta - store the first row and then the differences between rows
+        (delta encoding). The time column then holds dt at every step, and
+        slowly varying traces small numbers, which keep more precision in
+        float32. Delta encoded traces are decoded on reading, so they are
+        copies instead of views of the file.
+    """
+
+    def __init__(self, path, dtype='float64', delta=False):
+        self.path = path
+        if os.path.exists(path + '.json'):
+            with open(path + '.json') as f:
+                settings = json.load(f)
+            dtype, delta = settings['dtype'], settings['delta']
+        else:
+            with open(path + '.json', 'w') as f:
+                json.dump({'dtype': np.dtype(dtype).str, 'delta': delta}, f)
+            open(path, 'wb').close()
+            open(path + '.idx', 'wb').close()
+        self.dtype = np.dtype(dtype)
+        self.delta = delta
+        self.index = np.fromfile(path + '.idx', dtype=INDEX)
+        self._map = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def keys(self):
+        """ Key of every trace """
+        return self.index['key']
+
+    def append(self, data, key=np.nan):
+        """ Appends trace *data* (rows of time, value, ...) with *key* """
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        if self.delta:
+            data = np.concatenate([data[:1], np.diff(data, axis=0)])
+        offset = os.path.getsize(self.path) // self.dtype.itemsize
+        record = np.array([(offset, data.shape[0], data.shape[1], key)],
+                dtype=INDEX)
+        with open(self.path, 'ab') as f:
+            data.astype(self.dtype).tofile(f)
+        with open(self.path + '.idx', 'ab') as f:
+            record.tofile(f)
+        self.index = np.concatenate([self.index, record])
+
+    def _memmap(self):
+        """ Memory map of the whole data file, renewed when it has grown """
+        size = os.path.getsize(self.path) // self.dtype.itemsize
+        if self._map is None or len(self._map) != size:
+            self._map = np.memmap(self.path, dtype=self.dtype, mode='r',
+                    shape=(size,)) if size else np.empty(0, self.dtype)
+        return self._map
+
+    def __getitem__(self, i):
+        offset, rows, cols, key = self.index[i]
+        data = self._memmap()[offset:offset + rows*cols].reshape(rows, cols)
+        if self.delta:
+            return np.cumsum(data, axis=0, dtype=float)
+        return data
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def items(self):
+        """ (key, trace) pairs, the format f_vs_I takes """
+        for i in range(len(self)):
+            yield self.keys[i], self[i]